@@ -1,9 +1,33 @@
-import pygame
+import time
+
+INICIO_PROCESO = time.perf_counter()  # Referencia para medir el tiempo hasta el primer frame
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import zlib
 import math
 import random
+from collections import Counter, OrderedDict, deque, namedtuple
+
+# Los benchmarks y la simulación headless no necesitan ventana: usar el driver
+# de vídeo "dummy" de SDL
+if any(arg.startswith("--bench") or arg in ("--headless", "--lote") for arg in sys.argv):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
 
-# Inicializar Pygame
-pygame.init()
+# Inicializar solo los subsistemas que usa el juego (vídeo, que incluye los
+# eventos, y fuentes); pygame.init() arrancaría también el audio y los joysticks
+pygame.display.init()
+pygame.font.init()
 
 # Configuración de la pantalla responsive
 pantalla_info = pygame.display.Info()
@@ -23,13 +47,203 @@ COLOR_BARRA_ENERGIA = (0, 255, 0)
 # Tamaños
 TAMANO_NAVE = 30
 TAMANO_ASTEROIDE = [15, 30, 45, 60, 110, 250]  # Diferentes tamaños de asteroides
+TAMANO_CELDA_REJILLA = 128  # Lado de cada celda de la rejilla espacial de colisiones
+TAMANO_ASTEROIDE_ENJAMBRE = [15, 30]  # Tamaños en el modo enjambre (miles de asteroides)
+VELOCIDAD_MAX_ASTEROIDE = 5  # Velocidad máxima de aparición, también tope tras los choques
+
+# Balas
+VELOCIDAD_BALA = 10
+CAPACIDAD_BALAS = 4096  # Tamaño fijo del pool de balas
+
+# Partículas (solo visuales, no forman parte de la simulación)
+CAPACIDAD_PARTICULAS = 16384  # Tamaño fijo del pool de partículas
+PRESUPUESTO_PARTICULAS = 1024  # Partículas nuevas como máximo por tick; lo que sobra no se emite
+FRICCION_PARTICULAS = 0.95  # Factor de la velocidad de cada partícula por tick
+
+# Texto
+CAPACIDAD_CACHE_TEXTO = 256  # Superficies de texto renderizadas que se conservan
+
+# Sprites
+PRESUPUESTO_ATLAS = 64 * 1024 * 1024  # Bytes máximos de sprites pre-renderizados
+PASOS_ROTACION_NAVE = 360  # Ángulos cuantizados en los que se pre-renderiza la nave
+PASO_COLOR_ASTEROIDE = 8  # Cuantización por canal del color de los sprites de asteroide
+RADIO_BALA = 5
+
+# Fondo: (estrellas por píxel, píxeles por tick, brillo, lado en píxeles), de la capa más lejana a la más cercana
+CAPAS_ESTRELLAS = [(0.00015, 0.1, 0.5, 1), (0.00007, 0.3, 0.8, 1), (0.00003, 0.8, 1.0, 2)]
+
+# Renderizado por rectángulos sucios
+UMBRAL_DIRTY_RECTS = 0.35  # Fracción de la pantalla a partir de la cual se vuelve a flip() completo
+
+# Simulación
+TICKS_POR_SEGUNDO = 60  # Frecuencia fija de la simulación, independiente de los FPS de dibujo
+DT = 1 / TICKS_POR_SEGUNDO
+MAX_PASOS_POR_FRAME = 5  # Límite de pasos de recuperación por frame (evita la espiral de la muerte)
+CURVA_ASTEROIDES = (8, 100, 20)  # Máximo de asteroides: min(base + puntuación // puntos, tope)
+DANO_MAXIMO = 10  # Daño máximo de un choque con un asteroide (aleatorio desde 1)
+TICKS_EXPLOSION = 12  # Ticks (200 ms a 60 FPS) que un asteroide tarda en desaparecer al explotar
+TAMANO_RUEDA_TEMPORIZADORES = 256  # Ranuras (ticks) de la rueda de eventos programados
+BITS_INDICE_ENTIDAD = 24  # Bits bajos del id de entidad para el índice; el resto es la generación
+EVENTO_RETIRAR = 0  # Evento programado: retirar la entidad al final del tick
+
+# Perfilado
+FASES_PERFIL = ("entradas", "mover", "colisiones", "aparicion", "dibujo", "flip")
+VENTANA_PERFIL = 240  # Frames que entran en las medias móviles y el p99
+FRAMES_REFRESCO_PERFIL = 15  # Cada cuántos frames se vuelve a componer la superposición
+
+# Repeticiones (formato binario, little-endian)
+MAGIA_REPLAY = b"ASTR"
+VERSION_REPLAY = 1
+CABECERA_REPLAY = struct.Struct("<4sBqIHHIII")  # magia, versión, semilla, enjambre, ancho, alto, ticks, huella, corridas
+CORRIDA_REPLAY = struct.Struct("<HBhh")  # repeticiones, bits de teclas/botones, ratón x, ratón y
+
+# Configuración de la pantalla: la ventana solo se crea al jugar (ver iniciar_pantalla)
+pantalla = None
+
+def iniciar_pantalla():
+    global pantalla, campo_estelar, fondo_espacial
+    pantalla = pygame.display.set_mode((ANCHO, ALTO), pygame.FULLSCREEN)
+    pygame.display.set_caption("Juego de Naves Espaciales")
+    # El fondo se crea aquí y no al importar el módulo (headless no lo usa) y
+    # se convierte al formato de la pantalla para que copiarlo sea más rápido
+    campo_estelar = CampoEstelar(ANCHO, ALTO)
+    fondo_espacial = campo_estelar.componer()
+
+def ruta_fuente(nombre):
+    # None es la fuente por defecto de Pygame (incluida con el paquete) y no
+    # hace falta buscarla; las del sistema se buscan con match_font(), que
+    # recorre las fuentes instaladas, y CacheTexto crea cada Font una sola vez
+    return None if nombre is None else pygame.font.match_font(nombre)
+
+# Caché de texto renderizado
+class CacheTexto:
+    # Caché LRU de superficies de texto con clave (fuente, tamaño, texto, color).
+    # Las fuentes se crean una sola vez y los contadores de aciertos/fallos
+    # permiten comprobar que no se renderiza texto en cada frame.
+    def __init__(self, capacidad=CAPACIDAD_CACHE_TEXTO):
+        self.capacidad = capacidad
+        self.fuentes = {}
+        self.superficies = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def fuente(self, nombre, tamano):
+        fuente = self.fuentes.get((nombre, tamano))
+        if fuente is None:
+            fuente = self.fuentes[(nombre, tamano)] = pygame.font.Font(ruta_fuente(nombre), tamano)
+        return fuente
+
+    def render(self, texto, tamano=36, color=(255, 255, 255), nombre=None):
+        clave = (nombre, tamano, texto, color)
+        superficie = self.superficies.get(clave)
+        if superficie is not None:
+            self.superficies.move_to_end(clave)
+            self.aciertos += 1
+            return superficie
+        self.fallos += 1
+        superficie = self.fuente(nombre, tamano).render(texto, True, color)
+        self.superficies[clave] = superficie
+        if len(self.superficies) > self.capacidad:
+            self.superficies.popitem(last=False)
+        return superficie
+
+    def estadisticas(self):
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "entradas": len(self.superficies),
+            "fuentes": len(self.fuentes),
+        }
+
+cache_texto = CacheTexto()
+
+# Atlas de sprites pre-renderizados
+class AtlasSprites:
+    # Superficies pre-renderizadas (asteroides con su sombra, rotaciones de la
+    # nave, balas) con un presupuesto de memoria en bytes; al superarlo se
+    # expulsan las menos usadas recientemente.
+    def __init__(self, presupuesto=PRESUPUESTO_ATLAS):
+        self.presupuesto = presupuesto
+        self.sprites = OrderedDict()
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
 
-# Configuración de la pantalla
-pantalla = pygame.display.set_mode((ANCHO, ALTO), pygame.FULLSCREEN)
-pygame.display.set_caption("Juego de Naves Espaciales")
+    def obtener(self, clave):
+        sprite = self.sprites.get(clave)
+        if sprite is None:
+            self.fallos += 1
+            return None
+        self.sprites.move_to_end(clave)
+        self.aciertos += 1
+        return sprite
 
-# Fuente para el texto
-fuente = pygame.font.SysFont(None, 36)
+    def guardar(self, clave, sprite):
+        # Convertir al formato de la pantalla si ya existe (no en modo headless)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        self.sprites[clave] = sprite
+        self.bytes_usados += sprite.get_width() * sprite.get_height() * sprite.get_bytesize()
+        while self.bytes_usados > self.presupuesto and len(self.sprites) > 1:
+            _, expulsado = self.sprites.popitem(last=False)
+            self.bytes_usados -= expulsado.get_width() * expulsado.get_height() * expulsado.get_bytesize()
+            self.expulsiones += 1
+        return sprite
+
+    def estadisticas(self):
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expulsiones": self.expulsiones,
+            "sprites": len(self.sprites),
+            "bytes": self.bytes_usados,
+        }
+
+atlas = AtlasSprites()
+
+def sprite_asteroide(tamano, color):
+    # Asteroide con su sombra desplazada 2 px; el centro queda en (tamano, tamano)
+    clave = ("asteroide", tamano, color)
+    sprite = atlas.obtener(clave)
+    if sprite is None:
+        sprite = pygame.Surface((2 * tamano + 3, 2 * tamano + 3), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, COLOR_SOMBRA_ASTEROIDE, (tamano + 2, tamano + 2), tamano)
+        pygame.draw.circle(sprite, color, (tamano, tamano), tamano)
+        sprite = atlas.guardar(clave, sprite)
+    return sprite
+
+def sprite_nave(angulo):
+    # Nave rotada al ángulo cuantizado más cercano; el centro queda en
+    # (TAMANO_NAVE + 1, TAMANO_NAVE + 1)
+    paso = round(angulo * PASOS_ROTACION_NAVE / 360) % PASOS_ROTACION_NAVE
+    clave = ("nave", paso)
+    sprite = atlas.obtener(clave)
+    if sprite is None:
+        angulo = paso * 360 / PASOS_ROTACION_NAVE
+        c = TAMANO_NAVE + 1
+        puntos = [
+            (c + TAMANO_NAVE * math.cos(math.radians(angulo)),
+             c - TAMANO_NAVE * math.sin(math.radians(angulo))),
+            (c + (TAMANO_NAVE // 2) * math.cos(math.radians(angulo + 150)),
+             c - (TAMANO_NAVE // 2) * math.sin(math.radians(angulo + 150))),
+            (c + (TAMANO_NAVE // 2) * math.cos(math.radians(angulo - 150)),
+             c - (TAMANO_NAVE // 2) * math.sin(math.radians(angulo - 150)))
+        ]
+        sprite = pygame.Surface((2 * c + 1, 2 * c + 1), pygame.SRCALPHA)
+        pygame.draw.polygon(sprite, COLOR_NAVE, puntos)
+        # La "cabeza" de la nave como una línea
+        pygame.draw.line(sprite, (255, 255, 255), (c, c), puntos[0], 2)
+        sprite = atlas.guardar(clave, sprite)
+    return sprite
+
+def sprite_bala():
+    sprite = atlas.obtener("bala")
+    if sprite is None:
+        sprite = pygame.Surface((2 * RADIO_BALA, 2 * RADIO_BALA), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, COLOR_BALA, (RADIO_BALA, RADIO_BALA), RADIO_BALA)
+        sprite = atlas.guardar("bala", sprite)
+    return sprite
 
 # Reloj para controlar FPS
 reloj = pygame.time.Clock()
@@ -39,6 +253,7 @@ class Nave:
     def __init__(self):
         self.x = ANCHO // 2
         self.y = ALTO // 2
+        self.x_ant, self.y_ant = self.x, self.y  # Posición en el tick anterior (interpolación)
         self.angulo = 0
         self.velocidad = 5
         self.arma = 0  # 0: pistola, 1: ametralladora
@@ -47,59 +262,55 @@ class Nave:
         self.energia = 20
         self.tiempo_golpe = 0
 
-    def mover(self, teclas):
-        if teclas[pygame.K_w]:
+    def mover(self, entradas):
+        self.x_ant, self.y_ant = self.x, self.y
+        if entradas.arriba:
             self.y -= self.velocidad
-        if teclas[pygame.K_s]:
+        if entradas.abajo:
             self.y += self.velocidad
-        if teclas[pygame.K_a]:
+        if entradas.izquierda:
             self.x -= self.velocidad
-        if teclas[pygame.K_d]:
+        if entradas.derecha:
             self.x += self.velocidad
 
         # Restricción de los bordes de la pantalla
         self.x = max(0, min(ANCHO, self.x))
         self.y = max(0, min(ALTO, self.y))
 
-    def actualizar_angulo(self):
-        raton_x, raton_y = pygame.mouse.get_pos()
+    def actualizar_angulo(self, raton_x, raton_y):
         self.angulo = math.degrees(math.atan2(self.y - raton_y, raton_x - self.x)) % 360
 
-    def disparar(self):
+    def disparar(self, balas):
+        # Devuelve el número de balas creadas en el pool
         if self.energia > 0:
             if self.tipo_disparo == 0:
-                self.energia -= 1
-                return [Bala(self.x, self.y, self.angulo, self.arma)]
+                angulos = (self.angulo,)
             else:
-                balas = [Bala(self.x, self.y, self.angulo + i * 10, self.arma) for i in range(-2, 3)]
-                self.energia -= len(balas)
-                return balas
-        return []
+                angulos = [self.angulo + i * 10 for i in range(-2, 3)]
+            creadas = balas.disparar(self.x, self.y, angulos, self.arma)
+            self.energia -= creadas
+            return creadas
+        return 0
 
-    def dibujar(self):
-        # Definir la forma de la nave con más detalle
-        puntos = [
-            (self.x + TAMANO_NAVE * math.cos(math.radians(self.angulo)),
-             self.y - TAMANO_NAVE * math.sin(math.radians(self.angulo))),
-            (self.x + (TAMANO_NAVE // 2) * math.cos(math.radians(self.angulo + 150)),
-             self.y - (TAMANO_NAVE // 2) * math.sin(math.radians(self.angulo + 150))),
-            (self.x + (TAMANO_NAVE // 2) * math.cos(math.radians(self.angulo - 150)),
-             self.y - (TAMANO_NAVE // 2) * math.sin(math.radians(self.angulo - 150)))
-        ]
-        pygame.draw.polygon(pantalla, COLOR_NAVE, puntos)
-        
-        # Dibuja la "cabeza" de la nave como una línea
-        pygame.draw.line(pantalla, (255, 255, 255), (self.x, self.y), puntos[0], 2)
+    def dibujar(self, alpha=1.0):
+        # Devuelve los rectángulos de pantalla que ha modificado. alpha es la
+        # fracción de tick transcurrida para interpolar entre el tick anterior
+        # y el actual.
+        x = self.x_ant + (self.x - self.x_ant) * alpha
+        y = self.y_ant + (self.y - self.y_ant) * alpha
+
+        # La nave se dibuja con su sprite pre-renderizado para el ángulo actual
+        rects = [pantalla.blit(sprite_nave(self.angulo), (int(x) - TAMANO_NAVE - 1, int(y) - TAMANO_NAVE - 1))]
 
         # Dibujar efecto de golpe
         if self.tiempo_golpe > 0:
-            pygame.draw.circle(pantalla, (255, 0, 0), (int(self.x), int(self.y)), TAMANO_NAVE + 5, 2)
-            self.tiempo_golpe -= 1
+            rects.append(pygame.draw.circle(pantalla, (255, 0, 0), (int(x), int(y)), TAMANO_NAVE + 5, 2))
 
         # Dibujar barras de vida y energía
-        self.dibujar_barras()
+        rects.extend(self.dibujar_barras(x, y))
+        return rects
 
-    def dibujar_barras(self):
+    def dibujar_barras(self, x, y):
         # Barra de vida
         longitud_barra = 50
         ancho_barra = 5
@@ -107,85 +318,480 @@ class Nave:
         energia_ratio = self.energia / 20
 
         # Barra de vida
-        pygame.draw.rect(pantalla, (0, 0, 0), (self.x - longitud_barra // 2, self.y - TAMANO_NAVE - 10, longitud_barra, ancho_barra))
-        pygame.draw.rect(pantalla, COLOR_BARRA_VIDA, (self.x - longitud_barra // 2, self.y - TAMANO_NAVE - 10, longitud_barra * vida_ratio, ancho_barra))
+        rect_vida = pygame.draw.rect(pantalla, (0, 0, 0), (x - longitud_barra // 2, y - TAMANO_NAVE - 10, longitud_barra, ancho_barra))
+        pygame.draw.rect(pantalla, COLOR_BARRA_VIDA, (x - longitud_barra // 2, y - TAMANO_NAVE - 10, longitud_barra * vida_ratio, ancho_barra))
 
         # Barra de energía
-        pygame.draw.rect(pantalla, (0, 0, 0), (self.x - longitud_barra // 2, self.y + TAMANO_NAVE + 5, longitud_barra, ancho_barra))
-        pygame.draw.rect(pantalla, COLOR_BARRA_ENERGIA, (self.x - longitud_barra // 2, self.y + TAMANO_NAVE + 5, longitud_barra * energia_ratio, ancho_barra))
+        rect_energia = pygame.draw.rect(pantalla, (0, 0, 0), (x - longitud_barra // 2, y + TAMANO_NAVE + 5, longitud_barra, ancho_barra))
+        pygame.draw.rect(pantalla, COLOR_BARRA_ENERGIA, (x - longitud_barra // 2, y + TAMANO_NAVE + 5, longitud_barra * energia_ratio, ancho_barra))
+        return [rect_vida, rect_energia]
+
+class PoolBalas:
+    # Pool de balas en formato struct-of-arrays: arrays NumPy preasignados con
+    # posición, velocidad, tipo de arma y máscara de vida. La velocidad se
+    # calcula una sola vez al disparar y los huecos libres se guardan en una
+    # pila de índices, así que el bucle del juego no crea objetos por bala.
+    def __init__(self, capacidad=CAPACIDAD_BALAS):
+        self.capacidad = capacidad
+        self.x = np.zeros(capacidad)
+        self.y = np.zeros(capacidad)
+        self.x_ant = np.zeros(capacidad)  # Posición en el tick anterior (interpolación)
+        self.y_ant = np.zeros(capacidad)
+        self.vx = np.zeros(capacidad)
+        self.vy = np.zeros(capacidad)
+        self.tipo_arma = np.zeros(capacidad, dtype=np.int8)
+        self.viva = np.zeros(capacidad, dtype=bool)
+        self.libres = np.arange(capacidad - 1, -1, -1)
+        self.num_libres = capacidad
+        # Máscaras auxiliares reutilizadas en cada frame
+        self._fuera = np.zeros(capacidad, dtype=bool)
+        self._aux = np.zeros(capacidad, dtype=bool)
+
+    def __len__(self):
+        return self.capacidad - self.num_libres
 
-class Bala:
-    def __init__(self, x, y, angulo, tipo_arma):
-        self.x = x
-        self.y = y
-        self.angulo = angulo
-        self.velocidad = 10
-        self.tipo_arma = tipo_arma
+    def disparar(self, x, y, angulos, tipo_arma):
+        # Ocupa tantos huecos libres como ángulos haya (o los que queden)
+        n = min(len(angulos), self.num_libres)
+        if n == 0:
+            return 0
+        ranuras = self.libres[self.num_libres - n:self.num_libres]
+        self.num_libres -= n
+        radianes = np.radians(np.asarray(angulos[:n], dtype=float))
+        self.x[ranuras] = self.x_ant[ranuras] = x
+        self.y[ranuras] = self.y_ant[ranuras] = y
+        self.vx[ranuras] = VELOCIDAD_BALA * np.cos(radianes)
+        self.vy[ranuras] = -VELOCIDAD_BALA * np.sin(radianes)
+        self.tipo_arma[ranuras] = tipo_arma
+        self.viva[ranuras] = True
+        return n
+
+    def activas(self):
+        return np.flatnonzero(self.viva)
+
+    def liberar(self, indices):
+        n = len(indices)
+        if n == 0:
+            return
+        self.viva[indices] = False
+        self.libres[self.num_libres:self.num_libres + n] = indices
+        self.num_libres += n
 
     def mover(self):
-        self.x += self.velocidad * math.cos(math.radians(self.angulo))
-        self.y -= self.velocidad * math.sin(math.radians(self.angulo))
+        np.copyto(self.x_ant, self.x)
+        np.copyto(self.y_ant, self.y)
+        np.add(self.x, self.vx, out=self.x, where=self.viva)
+        np.add(self.y, self.vy, out=self.y, where=self.viva)
+
+        # Eliminar de golpe las balas que salen de la pantalla
+        fuera, aux = self._fuera, self._aux
+        np.less(self.x, 0, out=fuera)
+        np.logical_or(fuera, np.greater(self.x, ANCHO, out=aux), out=fuera)
+        np.logical_or(fuera, np.less(self.y, 0, out=aux), out=fuera)
+        np.logical_or(fuera, np.greater(self.y, ALTO, out=aux), out=fuera)
+        np.logical_and(fuera, self.viva, out=fuera)
+        self.liberar(np.flatnonzero(fuera))
+
+    def dibujar(self, alpha=1.0):
+        sprite = sprite_bala()
+        indices = self.activas()
+        x_ant, y_ant = self.x_ant[indices], self.y_ant[indices]
+        xs = x_ant + (self.x[indices] - x_ant) * alpha
+        ys = y_ant + (self.y[indices] - y_ant) * alpha
+        return pantalla.blits([(sprite, (int(x) - RADIO_BALA, int(y) - RADIO_BALA))
+                               for x, y in zip(xs.tolist(), ys.tolist())])
+
+class SistemaParticulas:
+    # Chispas y escombros con el mismo esquema que PoolBalas: arrays NumPy
+    # preasignados y pila de huecos libres. Se integran y se desvanecen en
+    # bloque, y se dibujan escribiendo todos los píxeles de golpe con
+    # surfarray en lugar de un blit por partícula. Usan su propio generador
+    # aleatorio para no alterar la partida (ni las repeticiones).
+    def __init__(self, capacidad=CAPACIDAD_PARTICULAS, presupuesto=PRESUPUESTO_PARTICULAS, semilla=None):
+        self.capacidad = capacidad
+        self.presupuesto = presupuesto
+        self.rng = np.random.default_rng(semilla)
+        self.x = np.zeros(capacidad)
+        self.y = np.zeros(capacidad)
+        self.x_ant = np.zeros(capacidad)
+        self.y_ant = np.zeros(capacidad)
+        self.vx = np.zeros(capacidad)
+        self.vy = np.zeros(capacidad)
+        self.vida = np.zeros(capacidad)  # Ticks que le quedan
+        self.vida_max = np.ones(capacidad)
+        self.color = np.zeros((capacidad, 3))
+        self.viva = np.zeros(capacidad, dtype=bool)
+        self.libres = np.arange(capacidad - 1, -1, -1)
+        self.num_libres = capacidad
+        self.emitidas_tick = 0
+        self.descartadas = 0  # Partículas no emitidas por el presupuesto o la capacidad
+
+    def __len__(self):
+        return self.capacidad - self.num_libres
 
-    def dibujar(self):
-        pygame.draw.circle(pantalla, COLOR_BALA, (int(self.x), int(self.y)), 5)
+    def emitir(self, x, y, n, velocidad, vida, color):
+        pedidas = n
+        n = min(n, self.presupuesto - self.emitidas_tick, self.num_libres)
+        self.descartadas += pedidas - max(n, 0)
+        if n <= 0:
+            return 0
+        ranuras = self.libres[self.num_libres - n:self.num_libres]
+        self.num_libres -= n
+        self.emitidas_tick += n
+        angulos = self.rng.uniform(0, 2 * math.pi, n)
+        rapidez = self.rng.uniform(0.3, 1.0, n) * velocidad
+        self.x[ranuras] = self.x_ant[ranuras] = x
+        self.y[ranuras] = self.y_ant[ranuras] = y
+        self.vx[ranuras] = rapidez * np.cos(angulos)
+        self.vy[ranuras] = rapidez * np.sin(angulos)
+        self.vida[ranuras] = self.vida_max[ranuras] = self.rng.uniform(0.5, 1.0, n) * vida
+        self.color[ranuras] = color
+        self.viva[ranuras] = True
+        return n
+
+    def chispas(self, x, y):
+        # Impacto de una bala
+        self.emitir(x, y, 6, 3.0, 15, COLOR_EXPLOSION)
+
+    def escombros(self, x, y, tamano):
+        # Destrucción de un asteroide: más piezas cuanto más grande
+        self.emitir(x, y, 10 + tamano // 2, 1.5 + tamano / 40, 45, COLOR_SOMBRA_ASTEROIDE)
+        self.emitir(x, y, 10 + tamano // 4, 3.0, 20, COLOR_EXPLOSION)
+
+    def activas(self):
+        return np.flatnonzero(self.viva)
+
+    def mover(self):
+        self.emitidas_tick = 0
+        indices = self.activas()
+        if len(indices) == 0:
+            return
+        self.x_ant[indices] = self.x[indices]
+        self.y_ant[indices] = self.y[indices]
+        self.x[indices] += self.vx[indices]
+        self.y[indices] += self.vy[indices]
+        self.vx[indices] *= FRICCION_PARTICULAS
+        self.vy[indices] *= FRICCION_PARTICULAS
+        self.vida[indices] -= 1
 
-    def fuera_de_pantalla(self):
-        return not (0 <= self.x <= ANCHO and 0 <= self.y <= ALTO)
+        # Liberar de golpe las que se apagan o salen de la pantalla
+        x, y = self.x[indices], self.y[indices]
+        muertas = indices[(self.vida[indices] <= 0) | (x < 0) | (x > ANCHO) | (y < 0) | (y > ALTO)]
+        n = len(muertas)
+        if n:
+            self.viva[muertas] = False
+            self.libres[self.num_libres:self.num_libres + n] = muertas
+            self.num_libres += n
+
+    def dibujar(self, alpha=1.0):
+        # Cada partícula es un cuadrado de 2x2 píxeles que se funde con lo que
+        # hay debajo a medida que se apaga
+        indices = self.activas()
+        if len(indices) == 0:
+            return []
+        x_ant, y_ant = self.x_ant[indices], self.y_ant[indices]
+        xs = (x_ant + (self.x[indices] - x_ant) * alpha).astype(np.intp)
+        ys = (y_ant + (self.y[indices] - y_ant) * alpha).astype(np.intp)
+        dentro = (xs >= 0) & (xs < ANCHO - 1) & (ys >= 0) & (ys < ALTO - 1)
+        indices, xs, ys = indices[dentro], xs[dentro], ys[dentro]
+        if len(indices) == 0:
+            return []
+        opacidad = (self.vida[indices] / self.vida_max[indices])[:, None]
+        pixeles = pygame.surfarray.pixels3d(pantalla)
+        colores = (pixeles[xs, ys] * (1 - opacidad) + self.color[indices] * opacidad).astype(np.uint8)
+        for dx in (0, 1):
+            for dy in (0, 1):
+                pixeles[xs + dx, ys + dy] = colores
+        del pixeles  # Desbloquea la pantalla
+        x0, y0 = int(xs.min()), int(ys.min())
+        return [pygame.Rect(x0, y0, int(xs.max()) - x0 + 2, int(ys.max()) - y0 + 2)]
 
 class Asteroide:
-    def __init__(self):
-        self.tamano = random.choice(TAMANO_ASTEROIDE)
-        self.x, self.y = self.generar_fuera_de_pantalla()
-        self.velocidad_x = random.uniform(-5 / (self.tamano / 15), 5 / (self.tamano / 15))
-        self.velocidad_y = random.uniform(-5 / (self.tamano / 15), 5 / (self.tamano / 15))
+    # rng es el generador aleatorio de la partida (random.Random con semilla);
+    # por defecto se usa el módulo random
+    def __init__(self, rng=random, tamanos=TAMANO_ASTEROIDE):
+        self.tamano = rng.choice(tamanos)
+        self.x, self.y = self.generar_fuera_de_pantalla(rng)
+        self.x_ant, self.y_ant = self.x, self.y  # Posición en el tick anterior (interpolación)
+        self.velocidad_x = rng.uniform(-5 / (self.tamano / 15), 5 / (self.tamano / 15))
+        self.velocidad_y = rng.uniform(-5 / (self.tamano / 15), 5 / (self.tamano / 15))
         self.vida = self.tamano // 15
         self.explosión = False
+        self.id = None  # Id de entidad con generación, lo asigna GestorEntidades
 
-        # Color de asteroide en tonos marrones
-        self.color = (
-            random.randint(100, 150),  # Rojo
-            random.randint(75, 125),   # Verde
-            random.randint(50, 100)    # Azul
-        )
+        # Color de asteroide en tonos marrones, cuantizado para que el número
+        # de sprites del atlas no crezca con el de asteroides (con miles en
+        # modo enjambre no cabrían en PRESUPUESTO_ATLAS)
+        self.color = tuple(c - c % PASO_COLOR_ASTEROIDE for c in (
+            rng.randint(100, 150),  # Rojo
+            rng.randint(75, 125),   # Verde
+            rng.randint(50, 100)    # Azul
+        ))
 
-    def generar_fuera_de_pantalla(self):
-        lado = random.choice(['izquierda', 'derecha', 'arriba', 'abajo'])
+    def generar_fuera_de_pantalla(self, rng=random):
+        lado = rng.choice(['izquierda', 'derecha', 'arriba', 'abajo'])
         if lado == 'izquierda':
-            return -self.tamano, random.randint(0, ALTO)
+            return -self.tamano, rng.randint(0, ALTO)
         elif lado == 'derecha':
-            return ANCHO + self.tamano, random.randint(0, ALTO)
+            return ANCHO + self.tamano, rng.randint(0, ALTO)
         elif lado == 'arriba':
-            return random.randint(0, ANCHO), -self.tamano
+            return rng.randint(0, ANCHO), -self.tamano
         else:
-            return random.randint(0, ANCHO), ALTO + self.tamano
+            return rng.randint(0, ANCHO), ALTO + self.tamano
 
-    def mover(self):
+    def mover(self, rng=random):
+        self.x_ant, self.y_ant = self.x, self.y
         self.x += self.velocidad_x
         self.y += self.velocidad_y
         if self.x < -self.tamano or self.x > ANCHO + self.tamano or self.y < -self.tamano or self.y > ALTO + self.tamano:
-            self.x, self.y = self.generar_fuera_de_pantalla()
-
-    def dibujar(self):
-        if not self.explosión:
-            pygame.draw.circle(pantalla, COLOR_SOMBRA_ASTEROIDE, (int(self.x) + 2, int(self.y) + 2), self.tamano)
-            pygame.draw.circle(pantalla, self.color, (int(self.x), int(self.y)), self.tamano)
-            fuente = pygame.font.SysFont(None, 24)
-            texto_vida = fuente.render(str(self.vida), True, (255, 255, 255))
-            pantalla.blit(texto_vida, (self.x - fuente.size(str(self.vida))[0] // 2, self.y - fuente.size(str(self.vida))[1] // 2))
+            self.x, self.y = self.generar_fuera_de_pantalla(rng)
+            self.x_ant, self.y_ant = self.x, self.y
 
-    def explotar(self):
+    def explotar(self, entidades=None):
+        # Se oculta ya y se retira TICKS_EXPLOSION ticks después
         self.explosión = True
-        pygame.time.set_timer(pygame.USEREVENT + 1, 200)
-
-def crear_fondo_espacial():
-    fondo = pygame.Surface((ANCHO, ALTO))
-    fondo.fill(COLOR_FONDO)
-    for _ in range(200):
-        x = random.randint(0, ANCHO)
-        y = random.randint(0, ALTO)
-        color = random.choice([COLOR_ESTRELLAS, (100, 100, 255)])
-        fondo.set_at((x, y), color)
-    return fondo
+        if entidades is not None:
+            entidades.programar(TICKS_EXPLOSION, EVENTO_RETIRAR, self.id)
+
+class RejillaEspacial:
+    # Rejilla uniforme (spatial hash) para la broad phase de colisiones: cada
+    # asteroide se registra en todas las celdas que toca su caja envolvente, así
+    # un punto (bala o nave) solo se compara con los asteroides de su celda.
+    def __init__(self, tamano_celda=TAMANO_CELDA_REJILLA):
+        self.tamano_celda = tamano_celda
+        self.celdas = {}
+
+    def reconstruir(self, asteroides):
+        self.celdas.clear()
+        t = self.tamano_celda
+        for asteroide in asteroides:
+            if asteroide.explosión:
+                continue
+            r = asteroide.tamano
+            x0, x1 = int((asteroide.x - r) // t), int((asteroide.x + r) // t)
+            y0, y1 = int((asteroide.y - r) // t), int((asteroide.y + r) // t)
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    celda = self.celdas.get((cx, cy))
+                    if celda is None:
+                        self.celdas[(cx, cy)] = [asteroide]
+                    else:
+                        celda.append(asteroide)
+
+    def cercanos(self, x, y):
+        t = self.tamano_celda
+        return self.celdas.get((int(x // t), int(y // t)), ())
+
+def colisionar_balas(rejilla, balas, entidades=None, particulas=None):
+    # Cada bala impacta como mucho en un asteroide. Las balas que impactan se
+    # devuelven al pool en bloque al final y se devuelven los puntos ganados.
+    # Con particulas (un SistemaParticulas) cada impacto suelta chispas.
+    impactadas = []
+    puntos = 0
+    indices = balas.activas()
+    for i, x, y in zip(indices.tolist(), balas.x[indices].tolist(), balas.y[indices].tolist()):
+        for asteroide in rejilla.cercanos(x, y):
+            if asteroide.explosión:
+                continue
+            dx = x - asteroide.x
+            dy = y - asteroide.y
+            if dx * dx + dy * dy < asteroide.tamano * asteroide.tamano:
+                asteroide.vida -= 1
+                if particulas is not None:
+                    particulas.chispas(x, y)
+                if asteroide.vida <= 0:
+                    puntos += asteroide.tamano // 15
+                    asteroide.explotar(entidades)
+                    if particulas is not None:
+                        particulas.escombros(asteroide.x, asteroide.y, asteroide.tamano)
+                impactadas.append(i)
+                break
+    balas.liberar(impactadas)
+    return puntos
+
+def colisionar_asteroides(asteroides):
+    # Choques elásticos entre asteroides (masa proporcional a tamano²).
+    # Broad phase con rejilla uniforme vectorizada: cada asteroide cae en la
+    # celda de su centro (lado = diámetro máximo), se ordenan por celda y cada
+    # celda solo se compara consigo misma y con 4 vecinas, así cada par
+    # candidato aparece una única vez.
+    vivos = [asteroide for asteroide in asteroides if not asteroide.explosión]
+    n = len(vivos)
+    if n < 2:
+        return 0
+    x = np.fromiter((a.x for a in vivos), float, n)
+    y = np.fromiter((a.y for a in vivos), float, n)
+    vx = np.fromiter((a.velocidad_x for a in vivos), float, n)
+    vy = np.fromiter((a.velocidad_y for a in vivos), float, n)
+    r = np.fromiter((a.tamano for a in vivos), float, n)
+
+    lado = 2 * r.max()
+    cx = np.floor(x / lado).astype(np.int64)
+    cy = np.floor(y / lado).astype(np.int64)
+    cx -= cx.min() - 1
+    cy -= cy.min() - 1
+    filas = int(cy.max()) + 2
+    claves = cx * filas + cy
+    orden = np.argsort(claves, kind="stable")
+    claves_ordenadas = claves[orden]
+
+    pares_i = []
+    pares_j = []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        objetivo = claves + dx * filas + dy
+        inicio = np.searchsorted(claves_ordenadas, objetivo, "left")
+        fin = np.searchsorted(claves_ordenadas, objetivo, "right")
+        cuantos = fin - inicio
+        total = int(cuantos.sum())
+        if total == 0:
+            continue
+        i = np.repeat(np.arange(n), cuantos)
+        desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuantos) - cuantos, cuantos)
+        j = orden[np.repeat(inicio, cuantos) + desplazamiento]
+        if dx == 0 and dy == 0:
+            mantener = j > i
+            i, j = i[mantener], j[mantener]
+        pares_i.append(i)
+        pares_j.append(j)
+    if not pares_i:
+        return 0
+    i = np.concatenate(pares_i)
+    j = np.concatenate(pares_j)
+
+    # Narrow phase: distancia al cuadrado frente a suma de radios al cuadrado
+    ddx = x[j] - x[i]
+    ddy = y[j] - y[i]
+    suma_r = r[i] + r[j]
+    dist2 = ddx * ddx + ddy * ddy
+    choque = dist2 < suma_r * suma_r
+    if not choque.any():
+        return 0
+    i, j, ddx, ddy, suma_r = i[choque], j[choque], ddx[choque], ddy[choque], suma_r[choque]
+    dist = np.maximum(np.sqrt(dist2[choque]), 1e-6)
+    nx = ddx / dist
+    ny = ddy / dist
+    mi = r[i] * r[i]
+    mj = r[j] * r[j]
+
+    # Impulso elástico solo si se acercan y separación de los que se solapan,
+    # ambos repartidos en proporción inversa a la masa. Con muchos contactos a
+    # la vez cada asteroide recibe la media de sus correcciones (no la suma),
+    # y la velocidad se limita a la máxima de aparición, para que el enjambre
+    # denso no gane energía.
+    vn = (vx[i] - vx[j]) * nx + (vy[i] - vy[j]) * ny
+    impulso = np.where(vn > 0, 2 * vn / (mi + mj), 0.0)
+    solape = (suma_r - dist) / (mi + mj)
+    dvx = np.bincount(j, impulso * mi * nx, n) - np.bincount(i, impulso * mj * nx, n)
+    dvy = np.bincount(j, impulso * mi * ny, n) - np.bincount(i, impulso * mj * ny, n)
+    dx = np.bincount(j, solape * mi * nx, n) - np.bincount(i, solape * mj * nx, n)
+    dy = np.bincount(j, solape * mi * ny, n) - np.bincount(i, solape * mj * ny, n)
+
+    contactos = np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+    tocados = np.flatnonzero(contactos)
+    contactos = contactos[tocados]
+    x = x[tocados] + dx[tocados] / contactos
+    y = y[tocados] + dy[tocados] / contactos
+    vx = vx[tocados] + dvx[tocados] / contactos
+    vy = vy[tocados] + dvy[tocados] / contactos
+    velocidad = np.hypot(vx, vy)
+    escala = np.minimum(1.0, VELOCIDAD_MAX_ASTEROIDE / np.maximum(velocidad, 1e-9))
+    vx *= escala
+    vy *= escala
+
+    for k, px, py, pvx, pvy in zip(tocados.tolist(), x.tolist(), y.tolist(), vx.tolist(), vy.tolist()):
+        asteroide = vivos[k]
+        asteroide.x, asteroide.y = px, py
+        asteroide.velocidad_x, asteroide.velocidad_y = pvx, pvy
+    return len(i)
+
+def colisionar_balas_ingenuo(balas, asteroides):
+    # Versión original O(B·A) que se conserva como referencia para el benchmark;
+    # cada bala es una lista [x, y]
+    puntos = 0
+    for bala in list(balas):
+        for asteroide in asteroides:
+            distancia = math.hypot(bala[0] - asteroide.x, bala[1] - asteroide.y)
+            if distancia < asteroide.tamano:
+                asteroide.vida -= 1
+                if bala in balas:
+                    balas.remove(bala)
+                if asteroide.vida <= 0:
+                    puntos += asteroide.tamano // 15
+                    asteroide.explotar()
+    return balas, puntos
+
+def dibujar_asteroides(asteroides, alpha=1.0):
+    # Un único lote de blits: primero los cuerpos y después las etiquetas de vida
+    lote = []
+    etiquetas = []
+    for asteroide in asteroides:
+        if asteroide.explosión:
+            continue
+        x = int(asteroide.x_ant + (asteroide.x - asteroide.x_ant) * alpha)
+        y = int(asteroide.y_ant + (asteroide.y - asteroide.y_ant) * alpha)
+        lote.append((sprite_asteroide(asteroide.tamano, asteroide.color), (x - asteroide.tamano, y - asteroide.tamano)))
+        texto_vida = cache_texto.render(str(asteroide.vida), 24)
+        etiquetas.append((texto_vida, (x - texto_vida.get_width() // 2, y - texto_vida.get_height() // 2)))
+    lote.extend(etiquetas)
+    return pantalla.blits(lote)
+
+class CampoEstelar:
+    # Fondo de estrellas en varias capas. Cada capa se genera de una vez con
+    # NumPy (una escritura vectorizada en vez de un set_at por estrella), con
+    # un número de estrellas proporcional al área de la pantalla, y se guarda
+    # ya convertida al formato de la pantalla. Al dibujar, cada capa se
+    # desplaza a su propia velocidad y se copia en dos trozos que dan la vuelta
+    # por el borde, así que el coste por frame son unos pocos blits.
+    def __init__(self, ancho, alto, capas=CAPAS_ESTRELLAS, semilla=None):
+        self.ancho = ancho
+        self.capas = []
+        rng = np.random.default_rng(semilla)
+        paleta = np.array([COLOR_ESTRELLAS, (100, 100, 255)], dtype=np.float32)
+        for i, (densidad, velocidad, brillo, lado) in enumerate(capas):
+            pixeles = np.zeros((ancho, alto, 3), dtype=np.uint8)
+            pixeles[:] = COLOR_FONDO
+            n = int(densidad * ancho * alto)
+            xs = rng.integers(0, ancho - lado + 1, n)
+            ys = rng.integers(0, alto - lado + 1, n)
+            colores = (paleta[rng.integers(0, len(paleta), n)] * brillo).astype(np.uint8)
+            for dx in range(lado):
+                for dy in range(lado):
+                    pixeles[xs + dx, ys + dy] = colores
+            superficie = pygame.surfarray.make_surface(pixeles)
+            if pygame.display.get_surface() is not None:
+                superficie = superficie.convert()
+            if i > 0:
+                # Las capas delanteras se dibujan encima con color clave; como
+                # son casi todo fondo, RLEACCEL las codifica por tramos y el
+                # blit solo recorre las estrellas en vez de toda la pantalla
+                superficie.set_colorkey(COLOR_FONDO, pygame.RLEACCEL)
+            self.capas.append((superficie, velocidad))
+
+    def dibujar(self, destino, desplazamiento):
+        lote = []
+        for superficie, velocidad in self.capas:
+            corte = int(desplazamiento * velocidad) % self.ancho
+            alto = superficie.get_height()
+            lote.append((superficie, (0, 0), pygame.Rect(corte, 0, self.ancho - corte, alto)))
+            if corte:
+                lote.append((superficie, (self.ancho - corte, 0), pygame.Rect(0, 0, corte, alto)))
+        destino.blits(lote, False)
+
+    def componer(self):
+        # Fondo estático (todas las capas sin desplazar) para las pantallas de
+        # inicio y resumen y para restaurar los rectángulos sucios
+        fondo = pygame.Surface(self.capas[0][0].get_size())
+        self.dibujar(fondo, 0)
+        if pygame.display.get_surface() is not None:
+            fondo = fondo.convert()
+        return fondo
+
+def dibujar_pantalla_inicio():
+    pantalla.blit(fondo_espacial, (0, 0))
+    pygame.draw.rect(pantalla, (0, 255, 0), boton_jugar)
+    texto_jugar = cache_texto.render("JUGAR", 36, (0, 0, 0))
+    pantalla.blit(texto_jugar, (boton_jugar.x + 10, boton_jugar.y + 10))
+    pygame.display.flip()
 
 def mostrar_pantalla_inicio():
     global reloj
@@ -199,12 +805,7 @@ def mostrar_pantalla_inicio():
                 if boton_jugar.collidepoint((raton_x, raton_y)):
                     return
 
-        pantalla.blit(fondo_espacial, (0, 0))
-        pygame.draw.rect(pantalla, (0, 255, 0), boton_jugar)
-        texto_jugar = fuente.render("JUGAR", True, (0, 0, 0))
-        pantalla.blit(texto_jugar, (boton_jugar.x + 10, boton_jugar.y + 10))
-
-        pygame.display.flip()
+        dibujar_pantalla_inicio()
         reloj.tick(FPS)
 
 def mostrar_resumen(puntos, asteroides_destruidos, balas_disparadas):
@@ -226,134 +827,985 @@ def mostrar_resumen(puntos, asteroides_destruidos, balas_disparadas):
         ]
         y = 10
         for linea in resumen_texto:
-            texto = fuente.render(linea, True, (255, 255, 255))
+            texto = cache_texto.render(linea)
             pantalla.blit(texto, (10, y))
             y += 40
 
         pygame.draw.rect(pantalla, (0, 255, 0), boton_reiniciar)
-        texto_reiniciar = fuente.render("JUGAR DE NUEVO", True, (0, 0, 0))
+        texto_reiniciar = cache_texto.render("JUGAR DE NUEVO", 36, (0, 0, 0))
         pantalla.blit(texto_reiniciar, (boton_reiniciar.x + 10, boton_reiniciar.y + 10))
 
         pygame.display.flip()
         reloj.tick(FPS)
 
-# Crear fondo espacial
-fondo_espacial = crear_fondo_espacial()
+# Fondo espacial (se crea en iniciar_pantalla)
+campo_estelar = None
+fondo_espacial = None
 
 # Configurar el botón de "JUGAR" y "JUGAR DE NUEVO"
 boton_jugar = pygame.Rect(ANCHO // 2 - 100, ALTO // 2 - 30, 200, 60)
 boton_reiniciar = pygame.Rect(ANCHO // 2 - 150, ALTO // 2 - 30, 300, 60)
 
-# Bucle principal del juego
-def juego():
-    # Inicializar objetos
-    nave = Nave()
-    balas = []
-    asteroides = [Asteroide() for _ in range(3)]
-    puntuacion = 0
-    asteroides_destruidos = 0
-    balas_disparadas = 0
+# Entradas de un tick: teclas de movimiento, ratón y pulsaciones de F/R
+Entradas = namedtuple("Entradas", [
+    "arriba", "abajo", "izquierda", "derecha",
+    "raton_x", "raton_y", "disparo",
+    "cambiar_arma", "cambiar_disparo",
+])
 
-    reloj = pygame.time.Clock()
-    ejecutando = True
-    disparo_temporal = 0
+ENTRADAS_VACIAS = Entradas(False, False, False, False, ANCHO // 2, 0, False, False, False)
 
-    while ejecutando:
-        for evento in pygame.event.get():
-            if evento.type == pygame.QUIT:
-                pygame.quit()
+class GestorEntidades:
+    # Ciclo de vida de las entidades de la partida:
+    # - ids con generación: el índice se reutiliza al destruir la entidad, pero
+    #   la generación cambia, así que un id antiguo nunca apunta a otra entidad
+    # - rueda de temporizadores por tick para eventos diferidos (O(1) al programar)
+    # - retirada diferida: las entidades se marcan durante el tick y se quitan
+    #   todas juntas al final en una sola pasada
+    def __init__(self, tamano_rueda=TAMANO_RUEDA_TEMPORIZADORES):
+        self.generaciones = []
+        self.libres = []
+        self.rueda = [[] for _ in range(tamano_rueda)]
+        self.tick = 0
+        self.pendientes = set()
+
+    def crear(self):
+        if self.libres:
+            indice = self.libres.pop()
+        else:
+            indice = len(self.generaciones)
+            self.generaciones.append(0)
+        return (self.generaciones[indice] << BITS_INDICE_ENTIDAD) | indice
+
+    def registrar(self, entidad):
+        entidad.id = self.crear()
+        return entidad
+
+    def vivo(self, id_entidad):
+        indice = id_entidad & ((1 << BITS_INDICE_ENTIDAD) - 1)
+        return self.generaciones[indice] == id_entidad >> BITS_INDICE_ENTIDAD
+
+    def programar(self, retraso, evento, id_entidad):
+        vence = self.tick + max(1, retraso)
+        self.rueda[vence % len(self.rueda)].append((vence, evento, id_entidad))
+
+    def avanzar(self):
+        # Pasa al siguiente tick y devuelve los eventos (evento, id) que vencen;
+        # los de retrasos mayores que la rueda se quedan para la vuelta siguiente
+        self.tick += 1
+        ranura = self.rueda[self.tick % len(self.rueda)]
+        if not ranura:
+            return ()
+        vencidos = [(evento, id_entidad) for vence, evento, id_entidad in ranura if vence == self.tick]
+        if len(vencidos) == len(ranura):
+            ranura.clear()
+        else:
+            ranura[:] = [programado for programado in ranura if programado[0] != self.tick]
+        return vencidos
+
+    def retirar(self, id_entidad):
+        if self.vivo(id_entidad):
+            self.pendientes.add(id_entidad)
+
+    def aplicar_retiradas(self, entidades):
+        # Devuelve (entidades restantes, número de retiradas)
+        if not self.pendientes:
+            return entidades, 0
+        restantes = [entidad for entidad in entidades if entidad.id not in self.pendientes]
+        for id_entidad in self.pendientes:
+            indice = id_entidad & ((1 << BITS_INDICE_ENTIDAD) - 1)
+            self.generaciones[indice] += 1
+            self.libres.append(indice)
+        self.pendientes.clear()
+        return restantes, len(entidades) - len(restantes)
+
+class EstadoJuego:
+    # Estado completo de una partida; paso() lo avanza un tick sin tocar la
+    # pantalla, los eventos ni el reloj de Pygame.
+    # Con enjambre > 0 la partida empieza con ese número de asteroides pequeños
+    # repartidos por la pantalla, que chocan entre sí, y esa población es el
+    # máximo en lugar de la curva de dificultad normal.
+    # Con particulas=True se generan los efectos visuales de impactos y
+    # explosiones (las partidas sin ventana no los necesitan).
+    def __init__(self, semilla=None, enjambre=0, particulas=False):
+        self.semilla = semilla
+        self.rng = random.Random(semilla)
+        self.nave = Nave()
+        self.balas = PoolBalas()
+        self.particulas = SistemaParticulas() if particulas else None
+        self.entidades = GestorEntidades()
+        self.tamanos = TAMANO_ASTEROIDE_ENJAMBRE if enjambre else TAMANO_ASTEROIDE
+        self.max_asteroides = enjambre or None
+        self.curva_asteroides = CURVA_ASTEROIDES
+        self.dano_maximo = DANO_MAXIMO
+        self.colisiones_asteroides = bool(enjambre)
+        self.asteroides = [self.entidades.registrar(Asteroide(self.rng, self.tamanos)) for _ in range(enjambre or 3)]
+        if enjambre:
+            for asteroide in self.asteroides:
+                asteroide.x = asteroide.x_ant = self.rng.uniform(0, ANCHO)
+                asteroide.y = asteroide.y_ant = self.rng.uniform(0, ALTO)
+        self.rejilla = RejillaEspacial()
+        self.puntuacion = 0
+        self.asteroides_destruidos = 0
+        self.balas_disparadas = 0
+        self.disparo_temporal = 0
+        self.tick = 0
+        self.terminado = False
+
+def paso(estado, entradas, perfil=None):
+    # perfil (opcional) es un Perfilador que recibe el tiempo de cada fase
+    nave = estado.nave
+    estado.tick += 1
+
+    if entradas.cambiar_arma:
+        nave.arma = (nave.arma + 1) % 2
+    if entradas.cambiar_disparo:
+        nave.tipo_disparo = (nave.tipo_disparo + 1) % 2
+
+    # Eventos programados que vencen en este tick
+    for evento, id_entidad in estado.entidades.avanzar():
+        if evento == EVENTO_RETIRAR:
+            estado.entidades.retirar(id_entidad)
+
+    nave.mover(entradas)
+    nave.actualizar_angulo(entradas.raton_x, entradas.raton_y)
+    if nave.tiempo_golpe > 0:
+        nave.tiempo_golpe -= 1
+
+    if entradas.disparo and estado.disparo_temporal <= 0 and nave.energia > 0:
+        estado.balas_disparadas += nave.disparar(estado.balas)
+        estado.disparo_temporal = 10
+
+    # Mover balas y partículas
+    estado.balas.mover()
+    if estado.particulas is not None:
+        estado.particulas.mover()
+
+    # Mover asteroides
+    for asteroide in estado.asteroides:
+        asteroide.mover(estado.rng)
+    if estado.colisiones_asteroides:
+        colisionar_asteroides(estado.asteroides)
+    if perfil is not None:
+        perfil.marcar("mover")
+
+    # Colisiones balas y asteroides (broad phase con la rejilla espacial)
+    estado.rejilla.reconstruir(estado.asteroides)
+    estado.puntuacion += colisionar_balas(estado.rejilla, estado.balas, estado.entidades, estado.particulas)
+
+    # Colisiones nave y asteroides
+    for asteroide in estado.rejilla.cercanos(nave.x, nave.y):
+        if asteroide.explosión:
+            continue  # Destruido por una bala en este mismo tick
+        dx = nave.x - asteroide.x
+        dy = nave.y - asteroide.y
+        if dx * dx + dy * dy < asteroide.tamano * asteroide.tamano:
+            # El asteroide rebota
+            asteroide.velocidad_x *= -1
+            asteroide.velocidad_y *= -1
+            # Daño a la nave
+            dano = estado.rng.randint(1, estado.dano_maximo)
+            nave.vida -= dano
+            nave.tiempo_golpe = 10
+            if estado.particulas is not None:
+                estado.particulas.chispas(nave.x, nave.y)
+            if nave.vida <= 0:
+                nave.vida = 0
+                estado.terminado = True
                 return
-            elif evento.type == pygame.KEYDOWN:
-                if evento.key == pygame.K_f:
-                    nave.arma = (nave.arma + 1) % 2
-                elif evento.key == pygame.K_r:
-                    nave.tipo_disparo = (nave.tipo_disparo + 1) % 2
-            elif evento.type == pygame.USEREVENT + 1:
-                for asteroide in asteroides:
-                    if asteroide.explosión:
-                        asteroides.remove(asteroide)
-                        asteroides_destruidos += 1
-
-        teclas = pygame.key.get_pressed()
-        nave.mover(teclas)
-        nave.actualizar_angulo()
-
-        if pygame.mouse.get_pressed()[0] and disparo_temporal <= 0 and nave.energia > 0:
-            balas.extend(nave.disparar())
-            balas_disparadas += len(nave.disparar())
-            disparo_temporal = 10
-
-        # Mover balas
-        for bala in list(balas):
-            bala.mover()
-            if bala.fuera_de_pantalla():
-                balas.remove(bala)
-
-        # Mover asteroides
-        for asteroide in asteroides:
-            asteroide.mover()
-
-        # Colisiones balas y asteroides
-        for bala in list(balas):
-            for asteroide in asteroides:
-                distancia = math.hypot(bala.x - asteroide.x, bala.y - asteroide.y)
-                if distancia < asteroide.tamano:
-                    asteroide.vida -= 1
-                    if bala in balas:
-                        balas.remove(bala)
-                    if asteroide.vida <= 0:
-                        puntuacion += asteroide.tamano // 15
-                        asteroide.explotar()
-
-        # Colisiones nave y asteroides
-        for asteroide in asteroides:
-            distancia = math.hypot(nave.x - asteroide.x, nave.y - asteroide.y)
-            if distancia < asteroide.tamano:
-                # El asteroide rebota
-                asteroide.velocidad_x *= -1
-                asteroide.velocidad_y *= -1
-                # Daño a la nave
-                dano = random.randint(1, 10)
-                nave.vida -= dano
-                nave.tiempo_golpe = 10
-                if nave.vida <= 0:
-                    nave.vida = 0
-                    pantalla.fill(COLOR_FONDO)
-                    mostrar_resumen(puntuacion, asteroides_destruidos, balas_disparadas)
-                    pygame.time.wait(2000)
-                    return
+    if perfil is not None:
+        perfil.marcar("colisiones")
+
+    # Incrementar el máximo de asteroides progresivamente
+    if estado.max_asteroides is not None:
+        max_asteroides = estado.max_asteroides
+    else:
+        base, puntos, tope = estado.curva_asteroides
+        max_asteroides = min(base + estado.puntuacion // puntos, tope)
+    if len(estado.asteroides) < max_asteroides:
+        estado.asteroides.append(estado.entidades.registrar(Asteroide(estado.rng, estado.tamanos)))
+
+    # Recargar energía
+    estado.disparo_temporal -= 1
+    if not entradas.disparo and nave.energia < 20:
+        nave.energia += 0.1
+
+    # Retirada diferida de las entidades marcadas durante el tick
+    estado.asteroides, retirados = estado.entidades.aplicar_retiradas(estado.asteroides)
+    estado.asteroides_destruidos += retirados
+    if perfil is not None:
+        perfil.marcar("aparicion")
+
+# Superposición de perfilado (se alterna con F3; no forma parte de la simulación)
+perfil_visible = False
+
+def leer_entradas_pygame(estado):
+    # Fuente de entradas del juego con ventana; devuelve None al cerrar
+    global perfil_visible
+    cambiar_arma = cambiar_disparo = False
+    for evento in pygame.event.get():
+        if evento.type == pygame.QUIT:
+            return None
+        elif evento.type == pygame.KEYDOWN:
+            if evento.key == pygame.K_f:
+                cambiar_arma = True
+            elif evento.key == pygame.K_r:
+                cambiar_disparo = True
+            elif evento.key == pygame.K_F3:
+                perfil_visible = not perfil_visible
+
+    teclas = pygame.key.get_pressed()
+    raton_x, raton_y = pygame.mouse.get_pos()
+    return Entradas(
+        teclas[pygame.K_w], teclas[pygame.K_s], teclas[pygame.K_a], teclas[pygame.K_d],
+        raton_x, raton_y, pygame.mouse.get_pressed()[0],
+        cambiar_arma, cambiar_disparo,
+    )
+
+class PoliticaAleatoria:
+    # Fuente de entradas para la simulación headless: un piloto que cambia de
+    # dirección y de objetivo al azar, con su propia semilla
+    def __init__(self, semilla=None):
+        self.rng = random.Random(semilla)
+        self.entradas = ENTRADAS_VACIAS
+
+    def __call__(self, estado):
+        if self.rng.random() < 0.05:
+            rng = self.rng
+            self.entradas = Entradas(
+                rng.random() < 0.3, rng.random() < 0.3, rng.random() < 0.3, rng.random() < 0.3,
+                rng.randint(0, ANCHO), rng.randint(0, ALTO), rng.random() < 0.7,
+                False, False,
+            )
+        return self.entradas
+
+class PoliticaQuieta:
+    # Piloto de referencia: no se mueve ni dispara
+    def __init__(self, semilla=None):
+        pass
+
+    def __call__(self, estado):
+        return ENTRADAS_VACIAS
+
+class PoliticaTirador:
+    # Piloto scriptado: apunta al asteroide más cercano, dispara mientras le
+    # quede energía y se aparta cuando lo tiene encima
+    def __init__(self, semilla=None):
+        pass
+
+    def __call__(self, estado):
+        nave = estado.nave
+        objetivo = None
+        mejor = float("inf")
+        for asteroide in estado.asteroides:
+            if asteroide.explosión:
+                continue
+            distancia = (asteroide.x - nave.x) ** 2 + (asteroide.y - nave.y) ** 2
+            if distancia < mejor:
+                objetivo, mejor = asteroide, distancia
+        if objetivo is None:
+            return ENTRADAS_VACIAS
+        peligro = mejor < (2 * objetivo.tamano + TAMANO_NAVE) ** 2
+        return Entradas(
+            peligro and objetivo.y > nave.y, peligro and objetivo.y < nave.y,
+            peligro and objetivo.x > nave.x, peligro and objetivo.x < nave.x,
+            int(objetivo.x), int(objetivo.y), nave.energia >= 1,
+            False, False,
+        )
+
+# Pilotos disponibles para las simulaciones por lotes
+POLITICAS = {
+    "aleatoria": PoliticaAleatoria,
+    "quieta": PoliticaQuieta,
+    "tirador": PoliticaTirador,
+}
+
+def dibujar_entidades(estado, alpha=1.0, perfil=None):
+    # Dibuja todo lo que se mueve o cambia y devuelve los rectángulos tocados
+    rects = estado.nave.dibujar(alpha)
+    rects.extend(estado.balas.dibujar(alpha))
+    rects.extend(dibujar_asteroides(estado.asteroides, alpha))
+    if estado.particulas is not None:
+        rects.extend(estado.particulas.dibujar(alpha))
+
+    # Dibujar puntuación
+    texto_puntuacion = cache_texto.render(f'Puntuación: {estado.puntuacion}')
+    rects.append(pantalla.blit(texto_puntuacion, (10, 10)))
+
+    if perfil is not None:
+        if perfil_visible:
+            rects.append(perfil.dibujar(estado))
+        perfil.marcar("dibujo")
+    return rects
+
+def dibujar_estado(estado, alpha=1.0, perfil=None):
+    campo_estelar.dibujar(pantalla, estado.tick + alpha)
+    dibujar_entidades(estado, alpha, perfil)
+    pygame.display.flip()
+    if perfil is not None:
+        perfil.marcar("flip")
+
+class RenderizadorDirtyRects:
+    # Alternativa a dibujar_estado: en vez de copiar el fondo completo y hacer
+    # flip(), restaura del fondo solo los rectángulos del frame anterior,
+    # dibuja las entidades y actualiza la unión de rectángulos anteriores y
+    # actuales. Si el área sucia supera el umbral vuelve a flip() completo.
+    # Usa el fondo estático: con las capas en movimiento toda la pantalla
+    # cambiaría en cada frame.
+    def __init__(self, umbral=UMBRAL_DIRTY_RECTS):
+        self.umbral = umbral
+        self.rects_anteriores = None
+        self.frames_parciales = 0
+        self.frames_completos = 0
+
+    def __call__(self, estado, alpha=1.0, perfil=None):
+        if self.rects_anteriores is None:
+            pantalla.blit(fondo_espacial, (0, 0))
+            rects = dibujar_entidades(estado, alpha, perfil)
+            pygame.display.flip()
+            self.frames_completos += 1
+        else:
+            pantalla.blits([(fondo_espacial, rect, rect) for rect in self.rects_anteriores], False)
+            rects = dibujar_entidades(estado, alpha, perfil)
+            sucios = self.rects_anteriores + rects
+            if sum(rect.w * rect.h for rect in sucios) > self.umbral * ANCHO * ALTO:
+                pygame.display.flip()
+                self.frames_completos += 1
+            else:
+                pygame.display.update(sucios)
+                self.frames_parciales += 1
+        if perfil is not None:
+            perfil.marcar("flip")
+        self.rects_anteriores = rects
+
+class TrazaFrames:
+    # Escribe una fila por frame con los nanosegundos de cada fase y el número
+    # de entidades; el formato (CSV o JSONL) se elige por la extensión
+    def __init__(self, ruta):
+        self.archivo = open(ruta, "w", newline="", encoding="utf-8")
+        self.jsonl = ruta.endswith(".jsonl")
+        self.columnas = ("frame",) + tuple(f"{fase}_ns" for fase in FASES_PERFIL) + ("balas", "asteroides")
+        if not self.jsonl:
+            self.escritor = csv.writer(self.archivo)
+            self.escritor.writerow(self.columnas)
+
+    def escribir(self, valores):
+        if self.jsonl:
+            self.archivo.write(json.dumps(dict(zip(self.columnas, valores))) + "\n")
+        else:
+            self.escritor.writerow(valores)
+
+    def cerrar(self):
+        self.archivo.close()
+
+class Perfilador:
+    # Mide con perf_counter_ns el tiempo de cada fase del frame (entradas,
+    # mover, colisiones, aparición, dibujo y flip). Guarda una ventana móvil
+    # por fase para la superposición (media y p99) y, si hay traza, vuelca
+    # cada frame en ella.
+    def __init__(self, traza=None, ventana=VENTANA_PERFIL):
+        self.traza = traza
+        self.muestras = {fase: deque(maxlen=ventana) for fase in FASES_PERFIL}
+        self.frame = dict.fromkeys(FASES_PERFIL, 0)
+        self.num_frame = 0
+        self.t = time.perf_counter_ns()
+        self.superficie = None
+
+    def empezar(self):
+        self.t = time.perf_counter_ns()
+
+    def marcar(self, fase):
+        # Asigna a la fase el tiempo transcurrido desde la marca anterior
+        ahora = time.perf_counter_ns()
+        self.frame[fase] += ahora - self.t
+        self.t = ahora
+
+    def cerrar_frame(self, estado):
+        for fase, ns in self.frame.items():
+            self.muestras[fase].append(ns)
+        if self.traza is not None:
+            self.traza.escribir([self.num_frame] + [self.frame[fase] for fase in FASES_PERFIL]
+                                + [len(estado.balas), len(estado.asteroides)])
+        self.frame = dict.fromkeys(FASES_PERFIL, 0)
+        self.num_frame += 1
+
+    def estadisticas(self):
+        # Media y p99 en milisegundos de cada fase en la ventana actual
+        resultado = {}
+        for fase, muestras in self.muestras.items():
+            if muestras:
+                ordenadas = sorted(muestras)
+                media = sum(ordenadas) / len(ordenadas) / 1e6
+                p99 = ordenadas[int(0.99 * (len(ordenadas) - 1))] / 1e6
+            else:
+                media = p99 = 0.0
+            resultado[fase] = (media, p99)
+        return resultado
+
+    def dibujar(self, estado):
+        # La superposición se recompone cada pocos frames para que medirla no
+        # dispare el coste que se quiere medir
+        if self.superficie is None or self.num_frame % FRAMES_REFRESCO_PERFIL == 0:
+            fuente = cache_texto.fuente(None, 20)
+            lineas = [f"{'fase':<11}{'media':>8}{'p99':>8}"]
+            for fase, (media, p99) in self.estadisticas().items():
+                lineas.append(f"{fase:<11}{media:>8.2f}{p99:>8.2f}")
+            lineas.append(f"balas: {len(estado.balas)}  asteroides: {len(estado.asteroides)}")
+            textos = [fuente.render(linea, True, (255, 255, 255)) for linea in lineas]
+            alto_linea = fuente.get_linesize()
+            self.superficie = pygame.Surface((max(t.get_width() for t in textos) + 10, alto_linea * len(textos) + 10))
+            self.superficie.fill((0, 0, 0))
+            for i, texto in enumerate(textos):
+                self.superficie.blit(texto, (5, 5 + i * alto_linea))
+        return pantalla.blit(self.superficie, (ANCHO - self.superficie.get_width() - 10, 10))
+
+class TelemetriaFrames:
+    # Tiempos del último frame (actualización y dibujo en ms, pasos de
+    # simulación ejecutados y descartados) y acumulados de toda la partida
+    def __init__(self):
+        self.frames = 0
+        self.ms_actualizacion = 0.0
+        self.ms_render = 0.0
+        self.pasos = 0
+        self.pasos_descartados = 0
+        self.total_ms_actualizacion = 0.0
+        self.total_ms_render = 0.0
+        self.total_pasos = 0
+        self.total_pasos_descartados = 0
+
+    def registrar(self, ms_actualizacion, ms_render, pasos, pasos_descartados):
+        self.frames += 1
+        self.ms_actualizacion = ms_actualizacion
+        self.ms_render = ms_render
+        self.pasos = pasos
+        self.pasos_descartados = pasos_descartados
+        self.total_ms_actualizacion += ms_actualizacion
+        self.total_ms_render += ms_render
+        self.total_pasos += pasos
+        self.total_pasos_descartados += pasos_descartados
 
-        # Incrementar el máximo de asteroides progresivamente
-        max_asteroides = min(8 + puntuacion // 100, 20)
-        if len(asteroides) < max_asteroides:
-            nuevo_asteroide = Asteroide()
-            asteroides.append(nuevo_asteroide)
+    def resumen(self):
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "ms_actualizacion_medio": self.total_ms_actualizacion / frames,
+            "ms_render_medio": self.total_ms_render / frames,
+            "pasos": self.total_pasos,
+            "pasos_descartados": self.total_pasos_descartados,
+        }
 
-        # Dibujar
+# Bucle principal del juego
+def juego(semilla=None, leer_entradas=leer_entradas_pygame, renderizar=dibujar_estado, fps=FPS, telemetria=None, perfil=None, enjambre=0,
+          grabador=None, reproductor=None):
+    # La simulación avanza a TICKS_POR_SEGUNDO fijos con un acumulador de
+    # tiempo; el dibujo va a su ritmo (fps, 0 = sin límite) e interpola las
+    # posiciones entre los dos últimos ticks.
+    # Con grabador se guardan las entradas de cada tick; con reproductor las
+    # entradas de cada tick salen de la repetición (leer_entradas solo sirve
+    # para poder cerrar la ventana). Devuelve el estado final.
+    if reproductor is not None:
+        semilla, enjambre = reproductor.semilla, reproductor.enjambre
+    estado = EstadoJuego(semilla, enjambre, particulas=True)
+    telemetria = telemetria if telemetria is not None else TelemetriaFrames()
+    perfil = perfil if perfil is not None else Perfilador()
+    reloj = pygame.time.Clock()
+    acumulado = 0.0
+    anterior = time.perf_counter()
+    # Pulsaciones de F/R pendientes: en los frames que no ejecutan ningún paso
+    # (pantallas de alta frecuencia) se guardan hasta el siguiente paso
+    cambiar_arma = cambiar_disparo = False
+
+    while True:
+        perfil.empezar()
+        entradas = leer_entradas(estado)
+        if entradas is None:
+            pygame.quit()
+            return estado
+        perfil.marcar("entradas")
+        cambiar_arma |= entradas.cambiar_arma
+        cambiar_disparo |= entradas.cambiar_disparo
+        entradas = entradas._replace(cambiar_arma=cambiar_arma, cambiar_disparo=cambiar_disparo)
+
+        ahora = time.perf_counter()
+        acumulado += ahora - anterior
+        anterior = ahora
+
+        pasos = 0
+        while acumulado >= DT and pasos < MAX_PASOS_POR_FRAME:
+            if reproductor is not None:
+                entradas = reproductor(estado)
+                if entradas is None:
+                    return estado
+            elif grabador is not None:
+                grabador.registrar(entradas)
+            paso(estado, entradas, perfil)
+            # Las pulsaciones de F/R solo se aplican en el primer paso
+            cambiar_arma = cambiar_disparo = False
+            entradas = entradas._replace(cambiar_arma=False, cambiar_disparo=False)
+            acumulado -= DT
+            pasos += 1
+            if estado.terminado:
+                pantalla.fill(COLOR_FONDO)
+                mostrar_resumen(estado.puntuacion, estado.asteroides_destruidos, estado.balas_disparadas)
+                pygame.time.wait(2000)
+                return estado
+
+        # Si la máquina no da abasto se descarta el tiempo pendiente en vez de
+        # intentar recuperarlo en frames posteriores
+        pasos_descartados = int(acumulado // DT)
+        acumulado -= pasos_descartados * DT
+        ms_actualizacion = (time.perf_counter() - ahora) * 1000
+
+        inicio_render = time.perf_counter()
+        renderizar(estado, acumulado / DT, perfil)
+        ms_render = (time.perf_counter() - inicio_render) * 1000
+        perfil.cerrar_frame(estado)
+
+        telemetria.registrar(ms_actualizacion, ms_render, pasos, pasos_descartados)
+        reloj.tick(fps)
+
+def simular(estado, leer_entradas, max_ticks, perfil=None):
+    # Bucle sin ventana ni límite de FPS: avanza hasta que la nave muere o se
+    # alcanza max_ticks
+    while not estado.terminado and estado.tick < max_ticks:
+        if perfil is None:
+            paso(estado, leer_entradas(estado))
+        else:
+            perfil.empezar()
+            entradas = leer_entradas(estado)
+            perfil.marcar("entradas")
+            paso(estado, entradas, perfil)
+            perfil.cerrar_frame(estado)
+    return estado
+
+def ejecutar_headless(ticks, semilla, perfil=None, enjambre=0, grabador=None, reproductor=None):
+    # Sin reproductor juega el piloto aleatorio; con reproductor se reproduce
+    # la repetición completa a máxima velocidad
+    if reproductor is not None:
+        estado = EstadoJuego(reproductor.semilla, reproductor.enjambre)
+        fuente, ticks = reproductor, reproductor.ticks
+    else:
+        estado = EstadoJuego(semilla, enjambre)
+        fuente = PoliticaAleatoria(semilla)
+        if grabador is not None:
+            politica = fuente
+            fuente = lambda estado: grabador.registrar(politica(estado))
+    inicio = time.perf_counter()
+    simular(estado, fuente, ticks, perfil)
+    duracion = time.perf_counter() - inicio
+    print(f"Ticks: {estado.tick} ({estado.tick / duracion:.0f} ticks/s)")
+    print(f"Puntuación: {estado.puntuacion}")
+    print(f"Asteroides destruidos: {estado.asteroides_destruidos}")
+    print(f"Balas disparadas: {estado.balas_disparadas}")
+    print(f"Vida restante: {estado.nave.vida}")
+    if reproductor is not None:
+        print(f"Reproducción exacta: {'sí' if reproductor.comprobar(estado) else 'NO'}")
+    if perfil is not None:
+        imprimir_perfil(perfil)
+    return estado
+
+def simular_trozo(semillas, politica, max_ticks, enjambre, curva_asteroides, dano_maximo):
+    # Trabajo de un proceso del lote: juega una partida headless por semilla y
+    # devuelve solo las métricas (ticks, puntuación, destruidos, disparadas)
+    resultados = []
+    for semilla in semillas:
+        estado = EstadoJuego(semilla, enjambre)
+        estado.curva_asteroides = curva_asteroides
+        estado.dano_maximo = dano_maximo
+        simular(estado, POLITICAS[politica](semilla), max_ticks)
+        resultados.append((estado.tick, estado.puntuacion, estado.asteroides_destruidos, estado.balas_disparadas))
+    return resultados
+
+class AgregadorResultados:
+    # Acumula las distribuciones del lote como histogramas de valores enteros,
+    # así la memoria no crece con el número de partidas
+    METRICAS = ("ticks", "puntuacion", "asteroides_destruidos", "balas_disparadas")
+
+    def __init__(self):
+        self.partidas = 0
+        self.sobreviven = 0
+        self.histogramas = {metrica: Counter() for metrica in self.METRICAS}
+
+    def agregar(self, resultado, max_ticks):
+        self.partidas += 1
+        if resultado[0] >= max_ticks:
+            self.sobreviven += 1
+        for metrica, valor in zip(self.METRICAS, resultado):
+            self.histogramas[metrica][valor] += 1
+
+    def resumen(self, metrica):
+        # Media, mínimo, p10, p50, p90 y máximo a partir del histograma
+        histograma = self.histogramas[metrica]
+        valores = sorted(histograma)
+        total = sum(histograma.values())
+        media = sum(valor * veces for valor, veces in histograma.items()) / total
+        percentiles = []
+        for p in (0.1, 0.5, 0.9):
+            objetivo = p * (total - 1)
+            acumulado = 0
+            for valor in valores:
+                acumulado += histograma[valor]
+                if acumulado > objetivo:
+                    percentiles.append(valor)
+                    break
+        return (media, valores[0], *percentiles, valores[-1])
+
+    def imprimir(self, max_ticks):
+        if not self.partidas:
+            print("Sin partidas")
+            return
+        print(f"Partidas: {self.partidas}  sobreviven {max_ticks} ticks: {self.sobreviven} ({100 * self.sobreviven / self.partidas:.1f}%)")
+        print(f"{'métrica':<22}{'media':>10}{'mín':>8}{'p10':>8}{'p50':>8}{'p90':>8}{'máx':>8}")
+        for metrica in self.METRICAS:
+            media, minimo, p10, p50, p90, maximo = self.resumen(metrica)
+            print(f"{metrica:<22}{media:>10.1f}{minimo:>8}{p10:>8}{p50:>8}{p90:>8}{maximo:>8}")
+        media_ticks = self.resumen("ticks")[0]
+        print(f"Supervivencia media: {media_ticks / TICKS_POR_SEGUNDO:.1f} s")
+
+def ejecutar_lote(partidas, politica, max_ticks, semilla=0, procesos=None, trozo=50, enjambre=0,
+                  curva_asteroides=CURVA_ASTEROIDES, dano_maximo=DANO_MAXIMO):
+    # Reparte las partidas en trozos de semillas consecutivas entre todos los
+    # núcleos. Solo hay unos pocos trozos en vuelo a la vez y los resultados se
+    # agregan según llegan.
+    procesos = procesos or os.cpu_count() or 1
+    agregador = AgregadorResultados()
+    trozos = (range(inicio, min(inicio + trozo, semilla + partidas))
+              for inicio in range(semilla, semilla + partidas, trozo))
+    inicio = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(procesos) as ejecutor:
+        pendientes = set()
+        for semillas in trozos:
+            pendientes.add(ejecutor.submit(simular_trozo, list(semillas), politica, max_ticks, enjambre,
+                                           curva_asteroides, dano_maximo))
+            if len(pendientes) >= 2 * procesos:
+                hechos, pendientes = concurrent.futures.wait(pendientes, return_when=concurrent.futures.FIRST_COMPLETED)
+                for futuro in hechos:
+                    for resultado in futuro.result():
+                        agregador.agregar(resultado, max_ticks)
+        for futuro in concurrent.futures.as_completed(pendientes):
+            for resultado in futuro.result():
+                agregador.agregar(resultado, max_ticks)
+    duracion = time.perf_counter() - inicio
+    print(f"Política: {politica}  procesos: {procesos}  {agregador.partidas / duracion:.1f} partidas/s")
+    agregador.imprimir(max_ticks)
+    return agregador
+
+def huella_estado(estado):
+    # CRC32 de los valores exactos (bits de los float) del estado de la partida,
+    # para comprobar que una reproducción acaba igual que la grabación
+    nave = estado.nave
+    datos = [struct.pack("<I5d3I", estado.tick, nave.x, nave.y, nave.vida, nave.energia, nave.angulo,
+                         estado.puntuacion, estado.asteroides_destruidos, estado.balas_disparadas)]
+    datos.extend(struct.pack("<2d", asteroide.x, asteroide.y) for asteroide in estado.asteroides)
+    indices = estado.balas.activas()
+    datos.append(estado.balas.x[indices].tobytes())
+    datos.append(estado.balas.y[indices].tobytes())
+    return zlib.crc32(b"".join(datos))
+
+def empaquetar_entradas(entradas):
+    bits = 0
+    for i, valor in enumerate((entradas.arriba, entradas.abajo, entradas.izquierda, entradas.derecha,
+                               entradas.disparo, entradas.cambiar_arma, entradas.cambiar_disparo)):
+        if valor:
+            bits |= 1 << i
+    return bits
+
+def desempaquetar_entradas(bits, raton_x, raton_y):
+    return Entradas(bool(bits & 1), bool(bits & 2), bool(bits & 4), bool(bits & 8),
+                    raton_x, raton_y, bool(bits & 16), bool(bits & 32), bool(bits & 64))
+
+class GrabadorReplay:
+    # Graba la semilla y las entradas de cada tick. Como las entradas cambian
+    # poco entre ticks se guardan por corridas (run-length): cada corrida es
+    # un registro de 7 bytes con las entradas y cuántos ticks seguidos duran.
+    def __init__(self, semilla, enjambre=0):
+        self.semilla = semilla
+        self.enjambre = enjambre
+        self.corridas = []
+        self.ticks = 0
+
+    def registrar(self, entradas):
+        self.ticks += 1
+        ultima = self.corridas[-1] if self.corridas else None
+        if ultima is not None and ultima[1] == entradas and ultima[0] < 0xFFFF:
+            ultima[0] += 1
+        else:
+            self.corridas.append([1, entradas])
+        return entradas
+
+    def guardar(self, ruta, estado):
+        with open(ruta, "wb") as archivo:
+            archivo.write(CABECERA_REPLAY.pack(MAGIA_REPLAY, VERSION_REPLAY, self.semilla, self.enjambre,
+                                               ANCHO, ALTO, self.ticks, huella_estado(estado), len(self.corridas)))
+            for veces, entradas in self.corridas:
+                archivo.write(CORRIDA_REPLAY.pack(veces, empaquetar_entradas(entradas),
+                                                  int(entradas.raton_x), int(entradas.raton_y)))
+
+class ReproductorReplay:
+    # Fuente de entradas que devuelve, tick a tick, las entradas grabadas
+    # (None al terminar). comprobar() compara el estado final con la huella
+    # guardada en la grabación.
+    def __init__(self, ruta):
+        with open(ruta, "rb") as archivo:
+            datos = archivo.read()
+        (magia, version, self.semilla, self.enjambre, self.ancho, self.alto,
+         self.ticks, self.huella, num_corridas) = CABECERA_REPLAY.unpack_from(datos)
+        if magia != MAGIA_REPLAY or version != VERSION_REPLAY:
+            raise ValueError(f"{ruta} no es una repetición válida")
+        self.corridas = []
+        for veces, bits, raton_x, raton_y in CORRIDA_REPLAY.iter_unpack(datos[CABECERA_REPLAY.size:]):
+            self.corridas.append((veces, desempaquetar_entradas(bits, raton_x, raton_y)))
+        if len(self.corridas) != num_corridas:
+            raise ValueError(f"{ruta} está incompleta")
+        self.corrida = 0
+        self.restantes = self.corridas[0][0] if self.corridas else 0
+
+    def __call__(self, estado):
+        while self.restantes == 0:
+            self.corrida += 1
+            if self.corrida >= len(self.corridas):
+                return None
+            self.restantes = self.corridas[self.corrida][0]
+        self.restantes -= 1
+        return self.corridas[self.corrida][1]
+
+    def comprobar(self, estado):
+        return huella_estado(estado) == self.huella
+
+def fijar_resolucion(ancho, alto):
+    # Los límites de la simulación dependen de la resolución, así que una
+    # repetición se reproduce con la misma con la que se grabó
+    global ANCHO, ALTO, campo_estelar, fondo_espacial, boton_jugar, boton_reiniciar
+    if (ancho, alto) == (ANCHO, ALTO):
+        return
+    ANCHO, ALTO = ancho, alto
+    if campo_estelar is not None:
+        campo_estelar = CampoEstelar(ANCHO, ALTO)
+        fondo_espacial = campo_estelar.componer()
+    boton_jugar = pygame.Rect(ANCHO // 2 - 100, ALTO // 2 - 30, 200, 60)
+    boton_reiniciar = pygame.Rect(ANCHO // 2 - 150, ALTO // 2 - 30, 300, 60)
+
+def imprimir_perfil(perfil):
+    print(f"{'fase':<11}{'media ms':>10}{'p99 ms':>10}")
+    for fase, (media, p99) in perfil.estadisticas().items():
+        print(f"{fase:<11}{media:>10.3f}{p99:>10.3f}")
+
+def benchmark_colisiones(repeticiones=20, semilla=0):
+    # Compara la rejilla espacial con el bucle original con cientos de balas y asteroides
+    random.seed(semilla)
+    print(f"{'balas':>6} {'asteroides':>10} {'original ms':>12} {'rejilla ms':>11} {'mejora':>7}")
+    for num_balas, num_asteroides in [(100, 20), (500, 100), (1000, 300), (2000, 500)]:
+        asteroides = []
+        for _ in range(num_asteroides):
+            asteroide = Asteroide()
+            asteroide.x, asteroide.y = random.uniform(0, ANCHO), random.uniform(0, ALTO)
+            asteroide.vida = 10 ** 9  # Ninguno explota durante la medición
+            asteroides.append(asteroide)
+        posiciones = [(random.uniform(0, ANCHO), random.uniform(0, ALTO)) for _ in range(num_balas)]
+
+        t_original = 0
+        for _ in range(repeticiones):
+            balas = [[x, y] for x, y in posiciones]
+            inicio = time.perf_counter()
+            colisionar_balas_ingenuo(balas, asteroides)
+            t_original += time.perf_counter() - inicio
+        t_original /= repeticiones
+
+        rejilla = RejillaEspacial()
+        t_rejilla = 0
+        for _ in range(repeticiones):
+            balas = PoolBalas(num_balas)
+            for x, y in posiciones:
+                balas.disparar(x, y, (0,), 0)
+            inicio = time.perf_counter()
+            rejilla.reconstruir(asteroides)
+            colisionar_balas(rejilla, balas)
+            t_rejilla += time.perf_counter() - inicio
+        t_rejilla /= repeticiones
+
+        print(f"{num_balas:>6} {num_asteroides:>10} {t_original * 1000:>12.2f} {t_rejilla * 1000:>11.2f} {t_original / t_rejilla:>6.1f}x")
+
+def benchmark_enjambre(segundos=3.0, semilla=0, cobertura=0.10):
+    # Pasos de simulación por segundo en modo enjambre con choques entre
+    # asteroides. Para que sea un enjambre y no un montón solapado, el área de
+    # juego (con la proporción de la pantalla) crece con la población hasta
+    # que los asteroides cubren esa fracción de ella.
+    ancho_pantalla, alto_pantalla = ANCHO, ALTO
+    area_media = math.pi * statistics.mean(r * r for r in TAMANO_ASTEROIDE_ENJAMBRE)
+    print(f"Cobertura: {cobertura:.0%} del área de juego ocupada por asteroides")
+    print(f"{'asteroides':>10} {'área':>12} {'pasos':>6} {'pasos/s':>9} {'ms/paso':>8}")
+    try:
+        for poblacion in (1000, 5000, 10000):
+            escala = max(1.0, math.sqrt(poblacion * area_media / cobertura / (ancho_pantalla * alto_pantalla)))
+            fijar_resolucion(int(ancho_pantalla * escala), int(alto_pantalla * escala))
+            estado = EstadoJuego(semilla, enjambre=poblacion)
+            estado.nave.vida = float("inf")  # La nave no debe acabar la medición
+            inicio = time.perf_counter()
+            while time.perf_counter() - inicio < segundos:
+                paso(estado, ENTRADAS_VACIAS)
+            duracion = time.perf_counter() - inicio
+            print(f"{poblacion:>10} {f'{ANCHO}x{ALTO}':>12} {estado.tick:>6} {estado.tick / duracion:>9.1f} "
+                  f"{duracion * 1000 / estado.tick:>8.2f}")
+    finally:
+        fijar_resolucion(ancho_pantalla, alto_pantalla)
+
+def benchmark_particulas(vivas=12000, frames=600):
+    # Coste por frame de integrar y dibujar miles de partículas vivas a la vez,
+    # reponiendo las que se apagan para mantener la población
+    iniciar_pantalla()
+    particulas = SistemaParticulas(capacidad=vivas, presupuesto=vivas, semilla=0)
+    tiempos_mover = []
+    tiempos_dibujo = []
+    poblacion = []
+    for _ in range(frames):
+        while len(particulas) < vivas:
+            particulas.emitir(ANCHO / 2, ALTO / 2, vivas - len(particulas), 8.0, 240, COLOR_EXPLOSION)
+            particulas.emitidas_tick = 0
         pantalla.blit(fondo_espacial, (0, 0))
-        nave.dibujar()
-        for bala in balas:
-            bala.dibujar()
-        for asteroide in asteroides:
-            asteroide.dibujar()
+        inicio = time.perf_counter()
+        particulas.mover()
+        medio = time.perf_counter()
+        particulas.dibujar()
+        fin = time.perf_counter()
+        tiempos_mover.append((medio - inicio) * 1000)
+        tiempos_dibujo.append((fin - medio) * 1000)
+        poblacion.append(len(particulas))
+    total = statistics.mean(tiempos_mover) + statistics.mean(tiempos_dibujo)
+    print(f"Partículas vivas (media): {statistics.mean(poblacion):.0f}")
+    print(f"Mover: {statistics.mean(tiempos_mover):.3f} ms/frame, dibujar: {statistics.mean(tiempos_dibujo):.3f} ms/frame")
+    print(f"Total: {total:.3f} ms/frame ({total * 100 / (1000 / FPS):.1f}% del presupuesto de un frame a {FPS} FPS)")
 
-        # Dibujar puntuación
-        texto_puntuacion = fuente.render(f'Puntuación: {puntuacion}', True, (255, 255, 255))
-        pantalla.blit(texto_puntuacion, (10, 10))
+def benchmark_arranque(repeticiones=5):
+    # Tiempo hasta el primer frame de la pantalla de inicio, lanzando el juego
+    # en procesos nuevos con el driver de vídeo "dummy"
+    entorno = dict(os.environ, SDL_VIDEODRIVER="dummy")
+    totales = []
+    internos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--salir-tras-primer-frame"],
+                                env=entorno, capture_output=True, text=True, check=True).stdout
+        totales.append((time.perf_counter() - inicio) * 1000)
+        internos.append(float(salida.split("primer_frame_ms=")[1].split()[0]))
+    print(f"Primer frame (proceso completo, mediana de {repeticiones}): {statistics.median(totales):.1f} ms")
+    print(f"Primer frame (desde el inicio del módulo): {statistics.median(internos):.1f} ms")
 
-        pygame.display.flip()
+    # Lo que costarían las alternativas que se evitan al arrancar
+    inicio = time.perf_counter()
+    pygame.init()
+    print(f"pygame.init() completo (audio, joysticks...): +{(time.perf_counter() - inicio) * 1000:.1f} ms")
+    inicio = time.perf_counter()
+    pygame.font.get_fonts()
+    print(f"Enumerar las fuentes del sistema (SysFont): {(time.perf_counter() - inicio) * 1000:.1f} ms")
 
-        # Controlar FPS y recargar energía
-        disparo_temporal -= 1
-        if not pygame.mouse.get_pressed()[0] and nave.energia < 20:
-            nave.energia += 0.1
-        reloj.tick(FPS)
+def main():
+    parser = argparse.ArgumentParser(description="Juego de naves espaciales y asteroides")
+    parser.add_argument("--bench-colisiones", action="store_true", help="Medir la detección de colisiones (rejilla espacial vs bucle original)")
+    parser.add_argument("--bench-enjambre", action="store_true", help="Medir pasos de simulación por segundo con 1k/5k/10k asteroides que chocan entre sí")
+    parser.add_argument("--bench-particulas", action="store_true", help="Medir el coste por frame de 12k partículas vivas")
+    parser.add_argument("--bench-arranque", action="store_true", help="Medir el tiempo de arranque hasta el primer frame")
+    parser.add_argument("--salir-tras-primer-frame", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--enjambre", type=int, default=0, help="Modo enjambre: número de asteroides pequeños que chocan entre sí (máximo de población)")
+    parser.add_argument("--headless", action="store_true", help="Simular una partida sin ventana ni límite de FPS con un piloto automático")
+    parser.add_argument("--ticks", type=int, default=10000, help="Ticks máximos a simular con --headless")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla del generador aleatorio de la partida")
+    parser.add_argument("--dirty-rects", action="store_true", help="Actualizar solo las zonas de pantalla que cambian en lugar de la pantalla completa")
+    parser.add_argument("--fps", type=int, default=FPS, help="Límite de frames dibujados por segundo (0 = sin límite); la simulación va siempre a 60 ticks/s")
+    parser.add_argument("--telemetria", action="store_true", help="Mostrar al salir los tiempos medios de actualización y dibujo por frame")
+    parser.add_argument("--perfil", action="store_true", help="Mostrar al salir la media y el p99 de cada fase del frame (F3 alterna la superposición en pantalla)")
+    parser.add_argument("--traza", default=None, help="Guardar los tiempos por fase de cada frame en un archivo .csv o .jsonl")
+    parser.add_argument("--grabar", default=None, help="Grabar la partida (semilla y entradas por tick) en este archivo")
+    parser.add_argument("--reproducir", default=None, help="Reproducir una partida grabada (con ventana, o a máxima velocidad con --headless)")
+    parser.add_argument("--lote", type=int, default=0, help="Jugar este número de partidas headless en paralelo e informar de las distribuciones")
+    parser.add_argument("--politica", choices=sorted(POLITICAS), default="tirador", help="Piloto automático de las partidas del lote")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del lote (por defecto, todos los núcleos)")
+    parser.add_argument("--trozo", type=int, default=50, help="Partidas por tarea enviada a cada proceso del lote")
+    parser.add_argument("--curva", default=",".join(map(str, CURVA_ASTEROIDES)),
+                        help="Curva de asteroides del lote: base,puntos,tope -> min(base + puntuación // puntos, tope)")
+    parser.add_argument("--dano-maximo", type=int, default=DANO_MAXIMO, help="Daño máximo por choque en las partidas del lote")
+    args = parser.parse_args()
+    if args.grabar:
+        # La cabecera de la grabación guarda la semilla como int64 y el enjambre
+        # como uint32: fuera de rango la grabación fallaría al guardarla, al final
+        if args.semilla is not None and not -2 ** 63 <= args.semilla < 2 ** 63:
+            parser.error("con --grabar, --semilla debe caber en 64 bits con signo")
+        if not 0 <= args.enjambre < 2 ** 32:
+            parser.error("con --grabar, --enjambre debe estar entre 0 y 2**32 - 1")
+    # Los parámetros del lote se comprueban aquí y no dentro de los procesos
+    try:
+        curva = tuple(int(valor) for valor in args.curva.split(","))
+    except ValueError:
+        curva = ()
+    if len(curva) != 3 or curva[1] <= 0:
+        parser.error("--curva debe ser base,puntos,tope (tres enteros, con puntos > 0)")
+    if args.trozo < 1:
+        parser.error("--trozo debe ser al menos 1")
+    if args.procesos is not None and args.procesos < 1:
+        parser.error("--procesos debe ser al menos 1")
+
+    traza = TrazaFrames(args.traza) if args.traza else None
+    perfil = Perfilador(traza)
+
+    grabador = reproductor = None
+    if args.reproducir:
+        try:
+            reproductor = ReproductorReplay(args.reproducir)
+        except (OSError, ValueError, struct.error) as e:
+            parser.error(f"no se pudo leer --reproducir: {e}")
+        fijar_resolucion(reproductor.ancho, reproductor.alto)
+    elif args.grabar:
+        # Una grabación necesita una semilla conocida
+        semilla = args.semilla if args.semilla is not None else random.randrange(2 ** 63)
+        grabador = GrabadorReplay(semilla, args.enjambre)
+        args.semilla = semilla
+
+    if args.bench_colisiones:
+        benchmark_colisiones()
+    elif args.bench_enjambre:
+        benchmark_enjambre()
+    elif args.bench_particulas:
+        benchmark_particulas()
+    elif args.bench_arranque:
+        benchmark_arranque()
+    elif args.salir_tras_primer_frame:
+        iniciar_pantalla()
+        dibujar_pantalla_inicio()
+        print(f"primer_frame_ms={(time.perf_counter() - INICIO_PROCESO) * 1000:.1f}")
+    elif args.lote:
+        ejecutar_lote(args.lote, args.politica, args.ticks, args.semilla or 0, args.procesos, args.trozo,
+                      args.enjambre, curva, args.dano_maximo)
+    elif args.headless:
+        estado = ejecutar_headless(args.ticks, args.semilla, perfil if args.perfil or traza else None, args.enjambre,
+                                   grabador, reproductor)
+        if grabador is not None:
+            grabador.guardar(args.grabar, estado)
+    else:
+        iniciar_pantalla()
+
+        # Pantalla de inicio
+        if reproductor is None:
+            mostrar_pantalla_inicio()
+
+        # Iniciar juego
+        telemetria = TelemetriaFrames()
+        estado = juego(args.semilla, renderizar=RenderizadorDirtyRects() if args.dirty_rects else dibujar_estado,
+                       fps=args.fps, telemetria=telemetria, perfil=perfil, enjambre=args.enjambre,
+                       grabador=grabador, reproductor=reproductor)
+        if grabador is not None:
+            grabador.guardar(args.grabar, estado)
+        if reproductor is not None:
+            print(f"Reproducción exacta: {'sí' if reproductor.comprobar(estado) else 'NO'}")
+        if args.telemetria:
+            for clave, valor in telemetria.resumen().items():
+                print(f"{clave}: {valor:.3f}" if isinstance(valor, float) else f"{clave}: {valor}")
+        if args.perfil:
+            imprimir_perfil(perfil)
 
-# Pantalla de inicio
-mostrar_pantalla_inicio()
+    if traza is not None:
+        traza.cerrar()
 
-# Iniciar juego
-juego()
+    # Cerrar Pygame
+    pygame.quit()
 
-# Cerrar Pygame
-pygame.quit()
+if __name__ == "__main__":
+    main()
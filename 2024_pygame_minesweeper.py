@@ -1,9 +1,25 @@
-import pygame
-import random
 import time
 
-# Configuración de Pygame
-pygame.init()
+INICIO_PROCESO = time.perf_counter()  # Referencia para medir el tiempo hasta el primer frame
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import OrderedDict, deque
+
+# Las mediciones no necesitan ventana visible: usar el driver de vídeo "dummy"
+if any(arg.startswith("--bench") for arg in sys.argv):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+# Configuración de Pygame: solo vídeo (incluye los eventos) y fuentes
+pygame.display.init()
+pygame.font.init()
 
 # Colores
 BLANCO = (255, 255, 255)
@@ -16,12 +32,26 @@ VERDE = (0, 255, 0)
 # Parámetros de las celdas
 ANCHO_CELDA = 30
 ALTO_CELDA = 30
+ALTO_BARRA = 30  # Franja superior con el contador de minas
+
+# Vista del tablero (desplazamiento y zoom)
+ANCHO_MAX_VISTA = 1200  # Los tableros más grandes se recorren desplazando la vista
+ALTO_MAX_VISTA = 800
+ZOOMS = (6, 8, 10, 12, 16, 20, 24, 30, 40)  # Lados de celda en píxeles (rueda del ratón)
+TROZO_CELDAS = 32  # Lado (en celdas) de cada trozo pre-compuesto del tablero
+PRESUPUESTO_TROZOS = 64 * 1024 * 1024  # Bytes máximos de trozos en caché
+CELDAS_ACTUALIZACION_DIRECTA = 256  # Con más celdas cambiadas se recompone toda la vista
+PASO_DESPLAZAMIENTO = 4  # Celdas que avanza la vista con cada pulsación de flecha
+
+# Latencia de los clics
+VENTANA_LATENCIA = 240  # Clics que entran en los percentiles de la superposición (F3)
+TRAMOS_REVELADO = (1, 10, 100, 1000, 10000)  # Límites de los grupos por celdas descubiertas
+MS_FRAME = 1000 / 60  # Referencia: un frame a 60 Hz
 
 # Crear la ventana
 ANCHO_VENTANA = 600
 ALTO_VENTANA = 400
-ventana = pygame.display.set_mode((ANCHO_VENTANA, ALTO_VENTANA))
-pygame.display.set_caption('Buscaminas')
+ventana = None  # Se crea en main()
 
 # Definir dificultades
 DIFICULTADES = {
@@ -30,69 +60,683 @@ DIFICULTADES = {
     'Dificil': (24, 24, 99)
 }
 
+# Flechas del teclado: (columnas, filas) que se desplaza la vista
+DIRECCIONES = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1),
+}
+
+# Contenido y estado de las celdas del Tablero
+MINA = -1
+OCULTA = 0
+DESCUBIERTA = 1
+MARCADA = 2
+
+# Losetas que no son un número de minas vecinas (0-8)
+LOSETA_MINA = 9
+LOSETA_OCULTA = 10
+LOSETA_MARCADA = 11
+
+# Generación sin adivinar
+MAX_INTENTOS_SIN_ADIVINAR = 1000  # Tableros que se prueban antes de rendirse
+TIEMPO_MAX_SIN_ADIVINAR = 2.0  # Segundos buscando un tablero sin adivinar antes de rendirse
+
 # Variables globales del juego
-cuadricula = []
-celda_descubierta = []
-celda_marcada = []
+tablero = None
 FILA = 0
 COL = 0
 NUM_MINAS = 0
 jugando = False
 inicio_tiempo = 0
 fin_tiempo = 0
-margen_x = 0
-margen_y = 0
+vista = None
+medidor = None  # MedidorLatencia, se crea en main()
 victoria = False
 
-def crear_cuadricula(fila, col):
-    return [[0 for _ in range(col)] for _ in range(fila)]
-
-def colocar_minas(cuadricula, fila, col, num_minas):
-    minas_colocadas = 0
-    while minas_colocadas < num_minas:
-        x = random.randint(0, fila - 1)
-        y = random.randint(0, col - 1)
-        if cuadricula[x][y] == 0:
-            cuadricula[x][y] = -1
-            minas_colocadas += 1
-            for i in range(max(0, x - 1), min(fila, x + 2)):
-                for j in range(max(0, y - 1), min(col, y + 2)):
-                    if cuadricula[i][j] != -1:
-                        cuadricula[i][j] += 1
-
-def dibujar_cuadricula(cuadricula, fila, col):
-    ventana.fill(NEGRO)
-    for x in range(fila):
-        for y in range(col):
-            rect = pygame.Rect(margen_x + y * ANCHO_CELDA, margen_y + x * ALTO_CELDA, ANCHO_CELDA, ALTO_CELDA)
-            if celda_descubierta[x][y]:
-                pygame.draw.rect(ventana, BLANCO, rect)
-                if cuadricula[x][y] == -1:
-                    pygame.draw.circle(ventana, ROJO, rect.center, ANCHO_CELDA // 4)
-                elif cuadricula[x][y] > 0:
-                    font = pygame.font.Font(None, 24)
-                    texto = font.render(str(cuadricula[x][y]), True, NEGRO)
-                    ventana.blit(texto, texto.get_rect(center=rect.center))
+# Fuentes creadas una sola vez por tamaño
+fuentes = {}
+
+# Imágenes de cada tipo de celda por lado en píxeles, dibujadas una sola vez (ver obtener_losetas)
+losetas = {}
+
+def obtener_fuente(tamano):
+    fuente = fuentes.get(tamano)
+    if fuente is None:
+        fuente = fuentes[tamano] = pygame.font.Font(None, tamano)
+    return fuente
+
+class Tablero:
+    # Tablero en arrays compactos: valores (int8) guarda MINA o el número de
+    # minas vecinas y estado (uint8) OCULTA, DESCUBIERTA o MARCADA, unos
+    # 3 bytes por celda en total. El estado es una vista NumPy sobre un
+    # bytearray para que el relleno de zonas, que es un bucle Python, lo lea y
+    # escriba sin pasar por NumPy celda a celda. Los contadores se actualizan
+    # al descubrir y marcar, así que comprobar la victoria no recorre nada.
+    def __init__(self, fila, col, num_minas):
+        if not 0 < num_minas < fila * col:
+            raise ValueError(f"número de minas fuera de rango para {fila}x{col}: {num_minas}")
+        self.fila = fila
+        self.col = col
+        self.num_minas = num_minas
+        self.valores = np.zeros((fila, col), dtype=np.int8)
+        self._estado = bytearray(fila * col)
+        self.estado = np.frombuffer(self._estado, dtype=np.uint8).reshape(fila, col)
+        self._vacias = bytes(fila * col)  # 1 si la celda no tiene minas alrededor
+        self.minas_colocadas = False
+        self.seguras_ocultas = fila * col - num_minas
+        self.banderas = 0
+        self.explotada = False
+
+    def nbytes(self):
+        return self.valores.nbytes + len(self._estado) + len(self._vacias)
+
+    def colocar_minas(self, rng, seguro=None):
+        # Muestreo sin reemplazo entre las celdas permitidas. Con seguro=(x, y)
+        # (primer clic) se excluye esa celda y sus vecinas si caben las minas.
+        fila, col = self.fila, self.col
+        permitidas = np.ones((fila, col), dtype=bool)
+        if seguro is not None:
+            x, y = seguro
+            zona = permitidas[max(0, x - 1):x + 2, max(0, y - 1):y + 2]
+            if fila * col - zona.size >= self.num_minas:
+                zona[:] = False
+            else:
+                permitidas[x, y] = False
+        minas = rng.choice(np.flatnonzero(permitidas), self.num_minas, replace=False)
+        es_mina = np.zeros((fila, col), dtype=bool)
+        es_mina.flat[minas] = True
+
+        # Minas vecinas: convolución 3x3 como suma de los 9 desplazamientos
+        # del tablero con un borde de ceros
+        borde = np.pad(es_mina, 1).astype(np.int8)
+        vecinas = sum(borde[i:i + fila, j:j + col] for i in range(3) for j in range(3))
+        self.valores = np.where(es_mina, MINA, vecinas).astype(np.int8)
+        self._vacias = (self.valores == 0).tobytes()
+        self.minas_colocadas = True
+
+    def descubrir(self, x, y):
+        # Descubre (x, y) y, si no tiene minas alrededor, toda la zona vacía
+        # conectada con su borde numerado. Relleno iterativo por tramos sobre
+        # índices planos: cada semilla se extiende por su fila mientras haya
+        # celdas vacías y luego se miran solo las filas de arriba y abajo del
+        # tramo. Devuelve los índices planos (x * col + y) descubiertos.
+        col = self.col
+        total = self.fila * col
+        estado = self._estado
+        vacias = self._vacias
+        i = x * col + y
+        if estado[i] != OCULTA:
+            return []
+        estado[i] = DESCUBIERTA
+        if self.valores[x, y] == MINA:
+            self.explotada = True
+            return [i]
+        # En el bucle, OCULTA (0) se comprueba por veracidad y DESCUBIERTA va en
+        # una variable local para no buscar globales en cada celda
+        descubierta = DESCUBIERTA
+        reveladas = [i]
+        pendientes = [i] if vacias[i] else []
+        while pendientes:
+            i = pendientes.pop()
+            inicio_fila = i - i % col
+            fin_fila = inicio_fila + col - 1
+            izq = i
+            while izq > inicio_fila and vacias[izq - 1] and not estado[izq - 1]:
+                izq -= 1
+                estado[izq] = descubierta
+                reveladas.append(izq)
+            der = i
+            while der < fin_fila and vacias[der + 1] and not estado[der + 1]:
+                der += 1
+                estado[der] = descubierta
+                reveladas.append(der)
+
+            inicio = izq - 1 if izq > inicio_fila else izq
+            fin = der + 1 if der < fin_fila else der
+            # Extremos del tramo en su propia fila (números)
+            for j in (inicio, fin):
+                if not estado[j]:
+                    estado[j] = descubierta
+                    reveladas.append(j)
+            # Filas vecinas: los números se descubren ya; de cada racha de
+            # celdas vacías solo se apila la primera, que se extenderá al sacarla
+            for desplazamiento in (-col, col):
+                if not 0 <= inicio + desplazamiento < total:
+                    continue
+                en_racha = False
+                for j in range(inicio + desplazamiento, fin + desplazamiento + 1):
+                    if estado[j]:
+                        en_racha = False
+                    elif not vacias[j]:
+                        estado[j] = descubierta
+                        reveladas.append(j)
+                        en_racha = False
+                    elif not en_racha:
+                        estado[j] = descubierta
+                        reveladas.append(j)
+                        pendientes.append(j)
+                        en_racha = True
+        self.seguras_ocultas -= len(reveladas)
+        return reveladas
+
+    def alternar_marca(self, x, y):
+        # Devuelve si la celda ha cambiado (las descubiertas no se pueden marcar)
+        i = x * self.col + y
+        if self._estado[i] == DESCUBIERTA:
+            return False
+        if self._estado[i] == MARCADA:
+            self._estado[i] = OCULTA
+            self.banderas -= 1
+        else:
+            self._estado[i] = MARCADA
+            self.banderas += 1
+        return True
+
+    def reiniciar(self):
+        # Vuelve a tapar todas las celdas conservando las minas
+        self.estado[:] = OCULTA
+        self.seguras_ocultas = self.fila * self.col - self.num_minas
+        self.banderas = 0
+        self.explotada = False
+
+    def victoria(self):
+        return self.seguras_ocultas == 0
+
+    def minas_restantes(self):
+        return self.num_minas - self.banderas
+
+    def codigos_losetas(self, indices=slice(None)):
+        # Loseta de cada celda (0-8, LOSETA_MINA, LOSETA_OCULTA o LOSETA_MARCADA)
+        estado = self.estado.ravel()[indices]
+        valores = self.valores.ravel()[indices]
+        return np.where(estado == DESCUBIERTA, np.where(valores == MINA, LOSETA_MINA, valores),
+                        np.where(estado == MARCADA, LOSETA_MARCADA, LOSETA_OCULTA))
+
+def vecinas_de(c, fila, col):
+    # Índices planos de las vecinas de la celda c
+    x, y = divmod(c, col)
+    return [i * col + j for i in range(max(0, x - 1), min(fila, x + 2))
+            for j in range(max(0, y - 1), min(col, y + 2)) if i != x or j != y]
+
+class Solucionador:
+    # Deducción lógica sobre lo que se ve del tablero (números descubiertos;
+    # las banderas del jugador no se tienen en cuenta). Cada número de la
+    # frontera es una restricción: sus vecinas desconocidas y las minas que
+    # faltan entre ellas. Reglas: si faltan 0 todas son seguras, si faltan
+    # tantas como celdas todas son minas, y si las vecinas de un número A
+    # están contenidas en las de otro B, la diferencia B - A es otra
+    # restricción a la que se aplica lo mismo. Solo se calculan las vecinas
+    # de los números de la frontera, y la regla de los subconjuntos usa
+    # máscaras de bits numeradas solo para las celdas desconocidas de la
+    # frontera, así que el coste crece con la frontera y no con el tablero.
+    def __init__(self, tablero):
+        self.tablero = tablero
+        self.valores = tablero.valores.tobytes()  # 0-8 en las celdas sin mina
+        self.minas = set()  # Minas deducidas (índices planos)
+        self.vecindario = {}  # Vecinas de los números de la frontera
+        # Frontera: números descubiertos con alguna vecina sin descubrir
+        fila, col = tablero.fila, tablero.col
+        tapadas = np.pad(tablero.estado != DESCUBIERTA, 1)
+        junto = np.zeros((fila, col), dtype=bool)
+        for dx in range(3):
+            for dy in range(3):
+                junto |= tapadas[dx:dx + fila, dy:dy + col]
+        numeros = (tablero.estado == DESCUBIERTA) & (tablero.valores > 0)
+        self.frontera = set(np.flatnonzero(numeros & junto).tolist())
+
+    def vecinas(self, c):
+        vecinas = self.vecindario.get(c)
+        if vecinas is None:
+            vecinas = self.vecindario[c] = vecinas_de(c, self.tablero.fila, self.tablero.col)
+        return vecinas
+
+    def agregar(self, reveladas):
+        vacias = self.tablero._vacias
+        self.frontera.update(i for i in reveladas if not vacias[i])
+
+    def revisar(self):
+        # Aplica las dos primeras reglas a la frontera; devuelve (seguras,
+        # minas, restricciones que no se resuelven solas)
+        estado = self.tablero._estado
+        valores = self.valores
+        minas = self.minas
+        seguras = set()
+        nuevas_minas = set()
+        restricciones = {}
+        for c in list(self.frontera):
+            desconocidas = []
+            faltan = valores[c]
+            for v in self.vecinas(c):
+                if v in minas:
+                    faltan -= 1
+                elif estado[v] != DESCUBIERTA:
+                    desconocidas.append(v)
+            if not desconocidas:
+                self.frontera.discard(c)
+                del self.vecindario[c]
+            elif faltan == 0:
+                seguras.update(desconocidas)
+            elif faltan == len(desconocidas):
+                nuevas_minas.update(desconocidas)
             else:
-                pygame.draw.rect(ventana, GRIS, rect)
-                if celda_marcada[x][y]:
-                    pygame.draw.line(ventana, AZUL, rect.topleft, rect.bottomright, 3)
-                    pygame.draw.line(ventana, AZUL, rect.bottomleft, rect.topright, 3)
-            pygame.draw.rect(ventana, NEGRO, rect, 1)
+                restricciones[c] = (desconocidas, faltan)
+        return seguras, nuevas_minas, restricciones
+
+    def deducir(self):
+        # Devuelve (seguras, minas) como listas ordenadas de índices planos
+        seguras, nuevas_minas, restricciones = self.revisar()
+        if seguras or nuevas_minas:
+            return sorted(seguras), sorted(nuevas_minas)
+
+        # Subconjuntos: cada celda desconocida recibe un bit solo para esta
+        # pasada. Solo pueden compartir celdas números a distancia <= 2.
+        bit_de = {}
+        celdas = []
+        for c, (desconocidas, faltan) in restricciones.items():
+            mascara = 0
+            for v in desconocidas:
+                bit = bit_de.get(v)
+                if bit is None:
+                    bit = bit_de[v] = len(celdas)
+                    celdas.append(v)
+                mascara |= 1 << bit
+            restricciones[c] = (mascara, faltan)
+        seguras = nuevas_minas = 0
+        col = self.tablero.col
+        for c, (a, faltan_a) in restricciones.items():
+            x, y = divmod(c, col)
+            for i in range(x - 2, x + 3):
+                for j in range(y - 2, y + 3):
+                    otra = restricciones.get(i * col + j) if 0 <= j < col else None
+                    if otra is None or otra[0] == a or a & ~otra[0]:
+                        continue
+                    resto = otra[0] & ~a
+                    faltan = otra[1] - faltan_a
+                    if faltan == 0:
+                        seguras |= resto
+                    elif faltan == resto.bit_count():
+                        nuevas_minas |= resto
+        return (sorted(celdas[i] for i in bits(seguras)),
+                sorted(celdas[i] for i in bits(nuevas_minas)))
+
+    def resolver(self, x, y, fin=None):
+        # Juega desde el primer clic solo con deducciones; devuelve si se
+        # descubre el tablero entero sin tener que adivinar (antes del instante
+        # fin de perf_counter, si se da)
+        tablero = self.tablero
+        col = tablero.col
+        self.agregar(tablero.descubrir(x, y))
+        while not tablero.victoria():
+            if fin is not None and time.perf_counter() > fin:
+                return False
+            seguras, minas = self.deducir()
+            if not seguras and not minas:
+                return False
+            self.minas.update(minas)
+            for i in seguras:
+                self.agregar(tablero.descubrir(*divmod(i, col)))
+        return True
+
+def bits(mascara):
+    # Índices de los bits a 1 de una máscara
+    while mascara:
+        bajo = mascara & -mascara
+        yield bajo.bit_length() - 1
+        mascara ^= bajo
+
+def generar_sin_adivinar(fila, col, num_minas, rng, primer_clic, intentos=MAX_INTENTOS_SIN_ADIVINAR,
+                         limite=TIEMPO_MAX_SIN_ADIVINAR):
+    # Prueba tableros con el primer clic seguro hasta dar con uno que el
+    # Solucionador despeja sin adivinar, durante como mucho `intentos`
+    # tableros y `limite` segundos. Devuelve (tablero, intentos), con tablero
+    # None si no lo encuentra.
+    fin = time.perf_counter() + limite
+    for intento in range(1, intentos + 1):
+        if time.perf_counter() > fin:
+            return None, intento - 1
+        tablero = Tablero(fila, col, num_minas)
+        tablero.colocar_minas(rng, seguro=primer_clic)
+        if Solucionador(tablero).resolver(*primer_clic, fin=fin):
+            tablero.reiniciar()
+            return tablero, intento
+    return None, intentos
+
+def pista(tablero):
+    # Una celda que se puede deducir con lo que hay descubierto: (x, y, es_mina)
+    # o None si hace falta adivinar. Se prefieren las seguras; las minas que
+    # el jugador ya ha marcado se dan por sabidas y se sigue deduciendo.
+    solucionador = Solucionador(tablero)
+    while True:
+        seguras, minas = solucionador.deducir()
+        if seguras:
+            return *divmod(seguras[0], tablero.col), False
+        if not minas:
+            return None
+        for i in minas:
+            if tablero._estado[i] == OCULTA:
+                return *divmod(i, tablero.col), True
+        solucionador.minas.update(minas)
+
+def obtener_losetas(lado=ANCHO_CELDA):
+    # Celda oculta, marcada, mina y descubierta con 0-8 minas alrededor, de
+    # lado x lado píxeles; lista indexada por el código de loseta
+    if lado not in losetas:
+        rect = pygame.Rect(0, 0, lado, lado)
+        lista = []
+        for clave in range(LOSETA_MARCADA + 1):
+            loseta = pygame.Surface(rect.size).convert()
+            if clave in (LOSETA_OCULTA, LOSETA_MARCADA):
+                loseta.fill(GRIS)
+                if clave == LOSETA_MARCADA:
+                    grosor = max(1, lado // 10)
+                    pygame.draw.line(loseta, AZUL, rect.topleft, rect.bottomright, grosor)
+                    pygame.draw.line(loseta, AZUL, rect.bottomleft, rect.topright, grosor)
+            else:
+                loseta.fill(BLANCO)
+                if clave == LOSETA_MINA:
+                    pygame.draw.circle(loseta, ROJO, rect.center, lado // 4)
+                elif clave > 0:
+                    texto = obtener_fuente(max(8, lado * 4 // 5)).render(str(clave), True, NEGRO)
+                    loseta.blit(texto, texto.get_rect(center=rect.center))
+            pygame.draw.rect(loseta, NEGRO, rect, 1)
+            lista.append(loseta)
+        losetas[lado] = lista
+    return losetas[lado]
+
+class Vista:
+    # Zona de la ventana (bajo la barra) que muestra parte del tablero, con
+    # desplazamiento y zoom. El tablero se divide en trozos de TROZO_CELDAS x
+    # TROZO_CELDAS celdas que se componen una vez en una superficie y se
+    # guardan en una caché LRU limitada por bytes, así que dibujar solo copia
+    # los pocos trozos visibles y el coste no depende del tamaño del tablero.
+    # Las celdas que cambian se repintan sobre los trozos ya compuestos.
+    # Las coordenadas de la cámara son los píxeles del tablero (columna,
+    # fila) que quedan en la esquina superior izquierda de la vista.
+    def __init__(self, rect, lado=ANCHO_CELDA):
+        self.rect = rect
+        self.lado = lado
+        self.camara_x = 0
+        self.camara_y = 0
+        self.trozos = OrderedDict()
+        self.bytes = 0
+        self.compuestos = 0  # Trozos compuestos desde cero (estadística)
+        self.ajustar()
+
+    def ajustar(self):
+        # Si el tablero cabe se centra; si no, la cámara no sale del tablero
+        for eje, celdas, ancho_vista in (("camara_x", COL, self.rect.w), ("camara_y", FILA, self.rect.h)):
+            ancho_tablero = celdas * self.lado
+            if ancho_tablero <= ancho_vista:
+                setattr(self, eje, -((ancho_vista - ancho_tablero) // 2))
+            else:
+                setattr(self, eje, min(max(getattr(self, eje), 0), ancho_tablero - ancho_vista))
+
+    def desplazar(self, dx, dy):
+        self.camara_x += dx
+        self.camara_y += dy
+        self.ajustar()
+
+    def zoom(self, pasos, pos):
+        # Cambia el lado de celda manteniendo fijo el punto bajo el ratón
+        actual = ZOOMS.index(self.lado) if self.lado in ZOOMS else ZOOMS.index(ANCHO_CELDA)
+        lado = ZOOMS[min(max(actual + pasos, 0), len(ZOOMS) - 1)]
+        if lado == self.lado:
+            return False
+        px, py = pos[0] - self.rect.x, pos[1] - self.rect.y
+        self.camara_x = (self.camara_x + px) * lado // self.lado - px
+        self.camara_y = (self.camara_y + py) * lado // self.lado - py
+        self.lado = lado
+        self.trozos.clear()
+        self.bytes = 0
+        self.ajustar()
+        return True
+
+    def centrar(self, x, y):
+        self.camara_x = y * self.lado + self.lado // 2 - self.rect.w // 2
+        self.camara_y = x * self.lado + self.lado // 2 - self.rect.h // 2
+        self.ajustar()
+
+    def celda_en(self, pos):
+        # Celda (x, y) bajo un punto de la ventana, o None
+        if not self.rect.collidepoint(pos):
+            return None
+        y = (pos[0] - self.rect.x + self.camara_x) // self.lado
+        x = (pos[1] - self.rect.y + self.camara_y) // self.lado
+        if 0 <= x < FILA and 0 <= y < COL:
+            return x, y
+        return None
+
+    def rect_celda(self, x, y):
+        return pygame.Rect(self.rect.x + y * self.lado - self.camara_x, self.rect.y + x * self.lado - self.camara_y,
+                           self.lado, self.lado)
+
+    def trozo(self, tf, tc):
+        superficie = self.trozos.get((tf, tc))
+        if superficie is not None:
+            self.trozos.move_to_end((tf, tc))
+            return superficie
+        x0, y0 = tf * TROZO_CELDAS, tc * TROZO_CELDAS
+        x1, y1 = min(x0 + TROZO_CELDAS, FILA), min(y0 + TROZO_CELDAS, COL)
+        lado = self.lado
+        superficie = pygame.Surface(((y1 - y0) * lado, (x1 - x0) * lado)).convert()
+        indices = (np.arange(x0, x1)[:, None] * COL + np.arange(y0, y1)).ravel()
+        self.pintar(superficie, x0, y0, indices)
+        self.compuestos += 1
+        self.trozos[(tf, tc)] = superficie
+        self.bytes += superficie.get_width() * superficie.get_height() * superficie.get_bytesize()
+        while self.bytes > PRESUPUESTO_TROZOS and len(self.trozos) > 1:
+            _, viejo = self.trozos.popitem(last=False)
+            self.bytes -= viejo.get_width() * viejo.get_height() * viejo.get_bytesize()
+        return superficie
+
+    def pintar(self, destino, x0, y0, indices, origen=(0, 0)):
+        # Copia en destino la loseta de cada celda (índices planos x * COL + y)
+        # tomando la celda (x0, y0) en la posición origen
+        lista = obtener_losetas(self.lado)
+        lado = self.lado
+        ox, oy = origen
+        codigos = tablero.codigos_losetas(indices).ravel().tolist()
+        return destino.blits([(lista[codigo], (ox + (i % COL - y0) * lado, oy + (i // COL - x0) * lado))
+                              for i, codigo in zip(np.asarray(indices).tolist(), codigos)])
+
+    def actualizar(self, indices):
+        # Lleva los cambios de celdas a los trozos en caché: se repintan las
+        # celdas sueltas y los trozos muy cambiados se descartan (se volverán
+        # a componer cuando se vean). Los índices se agrupan por trozo de una
+        # vez (argsort) y solo se miran los trozos en caché que aparecen, así
+        # que no se recorre la caché por cada celda cambiada.
+        if not self.trozos or len(indices) == 0:
+            return
+        indices = np.asarray(indices)
+        trozos_por_fila = (COL + TROZO_CELDAS - 1) // TROZO_CELDAS
+        ids = indices // COL // TROZO_CELDAS * trozos_por_fila + indices % COL // TROZO_CELDAS
+        # Solo interesan las celdas de trozos que están en la caché
+        en_cache = np.isin(ids, [tf * trozos_por_fila + tc for tf, tc in self.trozos])
+        indices, ids = indices[en_cache], ids[en_cache]
+        orden = np.argsort(ids, kind="stable")
+        unicos, inicios, cuentas = np.unique(ids[orden], return_index=True, return_counts=True)
+        for id_trozo, inicio, cuenta in zip(unicos.tolist(), inicios.tolist(), cuentas.tolist()):
+            clave = divmod(id_trozo, trozos_por_fila)
+            if clave not in self.trozos:
+                continue
+            if cuenta > TROZO_CELDAS * TROZO_CELDAS // 4:
+                superficie = self.trozos.pop(clave)
+                self.bytes -= superficie.get_width() * superficie.get_height() * superficie.get_bytesize()
+            else:
+                self.pintar(self.trozos[clave], clave[0] * TROZO_CELDAS, clave[1] * TROZO_CELDAS,
+                            indices[orden[inicio:inicio + cuenta]])
+
+    def dibujar(self):
+        # Compone la vista con los trozos visibles y devuelve su rectángulo
+        ventana.fill(NEGRO, self.rect)
+        ventana.set_clip(self.rect)
+        lado_trozo = TROZO_CELDAS * self.lado
+        primera_tc, primera_tf = max(0, self.camara_x // lado_trozo), max(0, self.camara_y // lado_trozo)
+        ultima_tc = min((COL - 1) // TROZO_CELDAS, (self.camara_x + self.rect.w - 1) // lado_trozo)
+        ultima_tf = min((FILA - 1) // TROZO_CELDAS, (self.camara_y + self.rect.h - 1) // lado_trozo)
+        ventana.blits([(self.trozo(tf, tc), (self.rect.x + tc * lado_trozo - self.camara_x,
+                                              self.rect.y + tf * lado_trozo - self.camara_y))
+                       for tf in range(primera_tf, ultima_tf + 1) for tc in range(primera_tc, ultima_tc + 1)], False)
+        ventana.set_clip(None)
+        return self.rect
+
+def dibujar_barra(mensaje=''):
+    rect = pygame.Rect(0, 0, ventana.get_width(), ALTO_BARRA)
+    ventana.fill(NEGRO, rect)
+    texto = obtener_fuente(24).render(f'Minas: {tablero.minas_restantes()}  {mensaje}', True, BLANCO)
+    ventana.blit(texto, (10, (ALTO_BARRA - texto.get_height()) // 2))
+    return rect
+
+def dibujar_cuadricula():
+    ventana.fill(NEGRO)
+    dibujar_barra()
+    vista.dibujar()
     pygame.display.flip()
 
-def descubrir_celda(cuadricula, fila, col, x, y):
+def actualizar_celdas(indices, barra=False):
+    # Lleva los cambios a los trozos en caché y envía a la pantalla solo las
+    # celdas indicadas (índices planos x * COL + y) y, si hace falta, la
+    # barra. Si han cambiado muchas celdas se recompone la vista entera.
+    vista.actualizar(indices)
+    if len(indices) > CELDAS_ACTUALIZACION_DIRECTA:
+        rects = [vista.dibujar()]
+    else:
+        ventana.set_clip(vista.rect)
+        origen = (vista.rect.x - vista.camara_x, vista.rect.y - vista.camara_y)
+        rects = [rect.clip(vista.rect) for rect in vista.pintar(ventana, 0, 0, indices, origen)]
+        ventana.set_clip(None)
+    if barra:
+        rects.append(dibujar_barra())
+    pygame.display.update(rects)
+
+def mostrar_pista():
+    # Recuadra en verde una celda segura (o en rojo una mina) que se puede
+    # deducir, centrando la vista en ella si no se ve; el recuadro desaparece
+    # cuando la celda se vuelve a dibujar
+    resultado = pista(tablero) if tablero.minas_colocadas else None
+    if resultado is None:
+        pygame.display.update(dibujar_barra('Sin pistas: hay que adivinar'))
+        return
+    x, y, es_mina = resultado
+    if not vista.rect.contains(vista.rect_celda(x, y)):
+        vista.centrar(x, y)
+        vista.dibujar()
+        pygame.display.update(vista.rect)
+    rect = vista.rect_celda(x, y)
+    pygame.draw.rect(ventana, ROJO if es_mina else VERDE, rect, 3)
+    pygame.display.update(rect)
+
+def tramo_revelado(celdas):
+    # Índice del grupo de un clic según las celdas que cambió
+    for indice, limite in enumerate(TRAMOS_REVELADO):
+        if celdas <= limite:
+            return indice
+    return len(TRAMOS_REVELADO)
+
+def etiqueta_tramo(indice):
+    # "0-1", "2-10", ..., ">10000"
+    if indice == len(TRAMOS_REVELADO):
+        return f">{TRAMOS_REVELADO[-1]}"
+    anterior = TRAMOS_REVELADO[indice - 1] if indice else -1
+    limite = TRAMOS_REVELADO[indice]
+    return str(limite) if limite == anterior + 1 else f"{anterior + 1}-{limite}"
+
+def percentiles(muestras):
+    # p50, p95 y p99 en milisegundos de una lista de nanosegundos
+    ordenadas = sorted(muestras)
+    return tuple(ordenadas[int(q * (len(ordenadas) - 1))] / 1e6 for q in (0.5, 0.95, 0.99))
+
+class MedidorLatencia:
+    # Latencia de cada clic medida con perf_counter_ns: desde que el evento
+    # MOUSEBUTTONDOWN sale de la cola hasta que termina de descubrirse (o
+    # marcarse) la celda, y hasta que display.update() ha enviado el
+    # resultado a la pantalla. Guarda todas las muestras para el informe por
+    # tamaño de tablero y de zona descubierta, una ventana móvil para la
+    # superposición y, si hay traza, escribe cada clic como una línea JSON.
+    def __init__(self, traza=None):
+        self.traza = open(traza, "w", encoding="utf-8") if traza else None
+        self.muestras = []  # ((filas, columnas), tramo, ns hasta revelado, ns hasta pantalla)
+        self.recientes = deque(maxlen=VENTANA_LATENCIA)
+        self.visible = False
+        self.superficie = None
+        self.t0 = self.t_revelado = 0
+
+    def empezar(self):
+        self.t0 = self.t_revelado = time.perf_counter_ns()
+
+    def marcar(self):
+        self.t_revelado = time.perf_counter_ns()
+
+    def cerrar(self, accion, celdas):
+        fin = time.perf_counter_ns()
+        revelado, pantalla = self.t_revelado - self.t0, fin - self.t0
+        muestra = ((FILA, COL), tramo_revelado(celdas), revelado, pantalla)
+        self.muestras.append(muestra)
+        self.recientes.append(muestra)
+        self.superficie = None
+        if self.traza is not None:
+            self.traza.write(json.dumps({"t_ns": self.t0, "accion": accion, "filas": FILA, "columnas": COL,
+                                         "celdas": celdas, "revelado_ns": revelado, "pantalla_ns": pantalla}) + "\n")
+
+    def estadisticas(self):
+        # (clics, p50/p95/p99 hasta revelado, p50/p95/p99 hasta pantalla) por
+        # (tablero, tramo de celdas descubiertas)
+        grupos = {}
+        for tamano, tramo, revelado, pantalla in self.muestras:
+            revelados, pantallas = grupos.setdefault((tamano, tramo), ([], []))
+            revelados.append(revelado)
+            pantallas.append(pantalla)
+        return {clave: (len(revelados), percentiles(revelados), percentiles(pantallas))
+                for clave, (revelados, pantallas) in grupos.items()}
+
+    def dibujar(self):
+        # Superposición en la esquina inferior derecha; el texto solo se
+        # vuelve a componer cuando llega un clic nuevo
+        if self.superficie is None:
+            fuente = obtener_fuente(20)
+            lineas = [f"{'ms':<10}{'p50':>7}{'p95':>7}{'p99':>7}"]
+            if self.recientes:
+                for nombre, posicion in (("revelado", 2), ("pantalla", 3)):
+                    p50, p95, p99 = percentiles([muestra[posicion] for muestra in self.recientes])
+                    lineas.append(f"{nombre:<10}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}")
+                ultimo = self.recientes[-1]
+                lineas.append(f"último: {ultimo[3] / 1e6:.2f} ms ({etiqueta_tramo(ultimo[1])} celdas)")
+            lineas.append(f"frame: {MS_FRAME:.1f} ms")
+            textos = [fuente.render(linea, True, BLANCO) for linea in lineas]
+            alto_linea = fuente.get_linesize()
+            self.superficie = pygame.Surface((max(t.get_width() for t in textos) + 10, alto_linea * len(textos) + 10))
+            self.superficie.fill(NEGRO)
+            for i, texto in enumerate(textos):
+                self.superficie.blit(texto, (5, 5 + i * alto_linea))
+        return ventana.blit(self.superficie, (ventana.get_width() - self.superficie.get_width() - 5,
+                                              ventana.get_height() - self.superficie.get_height() - 5))
+
+    def terminar(self):
+        if self.traza is not None:
+            self.traza.close()
+
+def imprimir_latencias(medidor):
+    print(f"{'tablero':>11} {'celdas':>11} {'clics':>6}   {'revelado p50/p95/p99 ms':>24}   {'pantalla p50/p95/p99 ms':>24}")
+    for ((filas, columnas), tramo), (clics, revelado, pantalla) in sorted(medidor.estadisticas().items()):
+        print(f"{f'{filas}x{columnas}':>11} {etiqueta_tramo(tramo):>11} {clics:>6}   {'/'.join(f'{v:.2f}' for v in revelado):>24}   "
+              f"{'/'.join(f'{v:.2f}' for v in pantalla):>24}")
+
+def descubrir_celda_recursivo(cuadricula, celda_descubierta, celda_marcada, fila, col, x, y):
+    # Versión recursiva original sobre listas anidadas; se conserva como
+    # referencia para las mediciones
     if x < 0 or x >= fila or y < 0 or y >= col or celda_descubierta[x][y] or celda_marcada[x][y]:
         return
     celda_descubierta[x][y] = True
     if cuadricula[x][y] == 0:
         for i in range(max(0, x - 1), min(fila, x + 2)):
             for j in range(max(0, y - 1), min(col, y + 2)):
-                descubrir_celda(cuadricula, fila, col, i, j)
+                descubrir_celda_recursivo(cuadricula, celda_descubierta, celda_marcada, fila, col, i, j)
 
 def pantalla_inicio():
     ventana.fill(NEGRO)
-    font = pygame.font.Font(None, 36)
+    font = obtener_fuente(36)
     texto = font.render('Seleccione la Dificultad', True, BLANCO)
     ventana.blit(texto, (ANCHO_VENTANA // 2 - texto.get_width() // 2, ALTO_VENTANA // 4))
 
@@ -109,80 +753,344 @@ def pantalla_inicio():
 
 def pantalla_final(mensaje):
     ventana.fill(NEGRO)
-    font = pygame.font.Font(None, 36)
+    font = obtener_fuente(36)
     texto = font.render(mensaje, True, BLANCO)
     ventana.blit(texto, (ANCHO_VENTANA // 2 - texto.get_width() // 2, ALTO_VENTANA // 2))
     pygame.display.flip()
     pygame.time.wait(3000)
 
-def verificar_victoria(fila, col):
-    for x in range(fila):
-        for y in range(col):
-            if cuadricula[x][y] != -1 and not celda_descubierta[x][y]:
-                return False
-    return True
+def benchmark_descubrir(tamanos=(30, 100, 300, 1000), densidad=0.01):
+    # Descubrir una zona abierta desde una celda vacía en tableros cuadrados
+    # con pocas minas: relleno iterativo frente a la versión recursiva (con el
+    # límite de recursión ampliado para que pueda terminar)
+    print(f"{'tablero':>11} {'celdas':>9} {'iterativo ms':>13} {'recursivo ms':>13}")
+    limite = sys.getrecursionlimit()
+    for lado in tamanos:
+        tablero = Tablero(lado, lado, int(lado * lado * densidad))
+        tablero.colocar_minas(np.random.default_rng(lado))
+        x, y = divmod(int(np.flatnonzero(tablero.valores == 0)[0]), lado)
+        inicio = time.perf_counter()
+        celdas = len(tablero.descubrir(x, y))
+        iterativo = (time.perf_counter() - inicio) * 1000
+
+        cuadricula = tablero.valores.tolist()
+        celda_descubierta = [[False] * lado for _ in range(lado)]
+        celda_marcada = [[False] * lado for _ in range(lado)]
+        sys.setrecursionlimit(max(limite, lado * lado + 100))
+        try:
+            inicio = time.perf_counter()
+            descubrir_celda_recursivo(cuadricula, celda_descubierta, celda_marcada, lado, lado, x, y)
+            recursivo = f"{(time.perf_counter() - inicio) * 1000:13.2f}"
+        except RecursionError:
+            recursivo = f"{'RecursionError':>13}"
+        finally:
+            sys.setrecursionlimit(limite)
+        print(f"{f'{lado}x{lado}':>11} {celdas:>9} {iterativo:13.2f} {recursivo}")
+
+def benchmark_tablero(densidad=0.2):
+    # Tiempo de generación (minas y vecinas) y memoria de tableros grandes con
+    # una densidad de minas alta y zona segura en el centro
+    print(f"{'tablero':>11} {'minas':>9} {'generar ms':>11} {'MB':>7} {'B/celda':>8}")
+    for lado in (24, 100, 1000, 4000):
+        minas = int(lado * lado * densidad)
+        inicio = time.perf_counter()
+        tablero = Tablero(lado, lado, minas)
+        tablero.colocar_minas(np.random.default_rng(lado), seguro=(lado // 2, lado // 2))
+        duracion = (time.perf_counter() - inicio) * 1000
+        print(f"{f'{lado}x{lado}':>11} {minas:>9} {duracion:>11.2f} {tablero.nbytes() / 2 ** 20:>7.2f} "
+              f"{tablero.nbytes() / (lado * lado):>8.1f}")
+
+def benchmark_sin_adivinar(segundos=3.0, semilla=0):
+    # Tableros sin adivinar generados por segundo en cada dificultad, con el
+    # primer clic en el centro
+    rng = np.random.default_rng(semilla)
+    print(f"{'dificultad':>10} {'tableros/s':>11} {'media ms':>9} {'máx ms':>8} {'intentos':>9}")
+    for nombre, (fila, col, num_minas) in DIFICULTADES.items():
+        tiempos = []
+        intentos = 0
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < segundos:
+            comienzo = time.perf_counter()
+            generado, usados = generar_sin_adivinar(fila, col, num_minas, rng, (fila // 2, col // 2))
+            tiempos.append((time.perf_counter() - comienzo) * 1000)
+            intentos += usados
+        print(f"{nombre:>10} {len(tiempos) / (time.perf_counter() - inicio):>11.1f} {statistics.mean(tiempos):>9.2f} "
+              f"{max(tiempos):>8.2f} {intentos / len(tiempos):>9.2f}")
+
+def benchmark_vista(frames=600, densidad=0.15):
+    # Coste por frame de componer la vista mientras se desplaza en diagonal
+    # (rebotando en los bordes) por tableros de distintos tamaños
+    global tablero, FILA, COL, NUM_MINAS, ventana, vista
+    print(f"{'tablero':>11} {'media ms':>9} {'p95 ms':>8} {'máx ms':>8} {'trozos compuestos':>18}")
+    for lado in (24, 200, 2000):
+        FILA = COL = lado
+        NUM_MINAS = int(lado * lado * densidad)
+        tablero = Tablero(FILA, COL, NUM_MINAS)
+        tablero.colocar_minas(np.random.default_rng(lado))
+        ancho, alto = min(COL * ANCHO_CELDA, ANCHO_MAX_VISTA), min(FILA * ALTO_CELDA, ALTO_MAX_VISTA)
+        ventana = pygame.display.set_mode((ancho, alto + ALTO_BARRA))
+        vista = Vista(pygame.Rect(0, ALTO_BARRA, ancho, alto))
+        dx, dy = 37, 23
+        tiempos = []
+        for _ in range(frames):
+            inicio = time.perf_counter()
+            vista.dibujar()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            x, y = vista.camara_x, vista.camara_y
+            vista.desplazar(dx, dy)
+            if vista.camara_x == x:
+                dx = -dx
+            if vista.camara_y == y:
+                dy = -dy
+        tiempos.sort()
+        print(f"{f'{lado}x{lado}':>11} {statistics.mean(tiempos):>9.3f} {tiempos[int(len(tiempos) * 0.95)]:>8.3f} "
+              f"{tiempos[-1]:>8.3f} {vista.compuestos:>18}")
+
+def benchmark_latencia(casos=((24, 0.15, 200, False), (200, 0.15, 200, False), (2000, 0.15, 200, False),
+                                (500, 0.11, 40, True), (200, 0.03, 20, True), (2000, 0.03, 5, True))):
+    # Clics sintéticos sobre celdas ocultas sin mina (y alguna bandera)
+    # siguiendo el mismo camino que el bucle del juego, con el informe de
+    # percentiles por tablero y tamaño de la zona descubierta. Cada caso es
+    # (lado, densidad de minas, clics, abierto); en los abiertos cada clic es
+    # el primero de un tablero nuevo con poca densidad, para medir las zonas
+    # de más de 1000 y 10000 celdas.
+    global tablero, FILA, COL, NUM_MINAS, ventana, vista, medidor
+    medidor = MedidorLatencia()
+    for lado, densidad, clics, abierto in casos:
+        FILA = COL = lado
+        NUM_MINAS = int(lado * lado * densidad)
+        rng = np.random.default_rng(lado)
+        ancho, alto = min(COL * ANCHO_CELDA, ANCHO_MAX_VISTA), min(FILA * ALTO_CELDA, ALTO_MAX_VISTA)
+        ventana = pygame.display.set_mode((ancho, alto + ALTO_BARRA))
+        vista = Vista(pygame.Rect(0, ALTO_BARRA, ancho, alto))
+        tablero = Tablero(FILA, COL, NUM_MINAS)
+        tablero.colocar_minas(rng)
+        dibujar_cuadricula()
+        for clic in range(clics):
+            if abierto:
+                x, y = (int(v) for v in rng.integers(0, lado, 2))
+                tablero = Tablero(FILA, COL, NUM_MINAS)
+                tablero.colocar_minas(rng, seguro=(x, y))
+                vista = Vista(vista.rect)
+                dibujar_cuadricula()
+                medidor.empezar()
+                reveladas = tablero.descubrir(x, y)
+                medidor.marcar()
+                actualizar_celdas(reveladas)
+                medidor.cerrar("descubrir", len(reveladas))
+                continue
+            candidatas = np.flatnonzero((tablero.estado == OCULTA).ravel() & (tablero.valores != MINA).ravel())
+            if not len(candidatas):
+                tablero.reiniciar()
+                tablero.colocar_minas(rng)
+                dibujar_cuadricula()
+                continue
+            x, y = divmod(int(rng.choice(candidatas)), COL)
+            if clic % 10 == 9:
+                medidor.empezar()
+                tablero.alternar_marca(x, y)
+                medidor.marcar()
+                actualizar_celdas([x * COL + y], barra=True)
+                medidor.cerrar("marcar", 1)
+                tablero.alternar_marca(x, y)
+                actualizar_celdas([x * COL + y], barra=True)
+            else:
+                medidor.empezar()
+                reveladas = tablero.descubrir(x, y)
+                medidor.marcar()
+                actualizar_celdas(reveladas)
+                medidor.cerrar("descubrir", len(reveladas))
+    imprimir_latencias(medidor)
+    print(f"Referencia: un frame a 60 Hz son {MS_FRAME:.2f} ms")
+    lentos = [f"{filas}x{columnas} {etiqueta_tramo(tramo)}"
+              for ((filas, columnas), tramo), (_, _, pantalla) in sorted(medidor.estadisticas().items())
+              if pantalla[2] > MS_FRAME]
+    if lentos:
+        print("p99 hasta pantalla por encima de un frame en:", ", ".join(lentos))
+    else:
+        print("p99 hasta pantalla por debajo de un frame en todos los grupos")
+
+def benchmark_arranque(repeticiones=5):
+    # Tiempo hasta el primer frame de la pantalla de inicio, lanzando el juego
+    # en procesos nuevos con el driver de vídeo "dummy"
+    entorno = dict(os.environ, SDL_VIDEODRIVER="dummy")
+    totales = []
+    internos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--salir-tras-primer-frame"],
+                                env=entorno, capture_output=True, text=True, check=True).stdout
+        totales.append((time.perf_counter() - inicio) * 1000)
+        internos.append(float(salida.split("primer_frame_ms=")[1].split()[0]))
+    print(f"Primer frame (proceso completo, mediana de {repeticiones}): {statistics.median(totales):.1f} ms")
+    print(f"Primer frame (desde el inicio del módulo): {statistics.median(internos):.1f} ms")
+
+    inicio = time.perf_counter()
+    pygame.init()
+    print(f"pygame.init() completo (audio, joysticks...): +{(time.perf_counter() - inicio) * 1000:.1f} ms")
 
 def main():
-    global cuadricula, celda_descubierta, celda_marcada, FILA, COL, NUM_MINAS, jugando, inicio_tiempo, fin_tiempo, margen_x, margen_y, ventana, ANCHO_VENTANA, ALTO_VENTANA, victoria
+    global tablero, FILA, COL, NUM_MINAS, jugando, inicio_tiempo, fin_tiempo, vista, ventana, ANCHO_VENTANA, ALTO_VENTANA, victoria, medidor
+
+    parser = argparse.ArgumentParser(description="Buscaminas")
+    parser.add_argument("--bench-arranque", action="store_true", help="Medir el tiempo de arranque hasta el primer frame")
+    parser.add_argument("--bench-descubrir", action="store_true", help="Medir el descubrimiento de zonas abiertas (iterativo vs recursivo)")
+    parser.add_argument("--bench-tablero", action="store_true", help="Medir la generación y la memoria de tableros grandes")
+    parser.add_argument("--bench-sin-adivinar", action="store_true", help="Medir los tableros sin adivinar generados por segundo en cada dificultad")
+    parser.add_argument("--bench-vista", action="store_true", help="Medir el coste por frame de la vista desplazándose por tableros de 24x24 a 2000x2000")
+    parser.add_argument("--bench-latencia", action="store_true", help="Medir la latencia de los clics (hasta descubrir y hasta pantalla) en tableros de 24x24 a 2000x2000")
+    parser.add_argument("--salir-tras-primer-frame", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--filas", type=int, default=None, help="Dificultad propia: filas del tablero (con --columnas y --minas)")
+    parser.add_argument("--columnas", type=int, default=None, help="Dificultad propia: columnas del tablero")
+    parser.add_argument("--minas", type=int, default=None, help="Dificultad propia: número de minas")
+    parser.add_argument("--primer-clic-seguro", action="store_true", help="Colocar las minas tras el primer clic, lejos de esa celda y sus vecinas")
+    parser.add_argument("--sin-adivinar", action="store_true", help="Generar (tras el primer clic) solo tableros que se resuelven sin adivinar; H da una pista")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla del generador de minas")
+    parser.add_argument("--latencia", action="store_true", help="Mostrar al salir los percentiles de latencia de los clics; F3 muestra la superposición")
+    parser.add_argument("--traza-latencia", metavar="RUTA", default=None, help="Escribir cada clic en RUTA como una línea JSON (JSONL)")
+    args = parser.parse_args()
+
+    propia = (args.filas, args.columnas, args.minas)
+    if any(valor is not None for valor in propia):
+        if None in propia:
+            parser.error("la dificultad propia necesita --filas, --columnas y --minas")
+        if min(propia) <= 0 or args.minas >= args.filas * args.columnas:
+            parser.error("dificultad propia no válida")
+        DIFICULTADES[f'{args.filas}x{args.columnas}'] = propia
+    rng = np.random.default_rng(args.semilla)
+
+    if args.bench_arranque:
+        benchmark_arranque()
+        return
+    if args.bench_descubrir:
+        benchmark_descubrir()
+        return
+    if args.bench_tablero:
+        benchmark_tablero()
+        return
+    if args.bench_sin_adivinar:
+        benchmark_sin_adivinar()
+        return
+    if args.bench_vista:
+        benchmark_vista()
+        return
+    if args.bench_latencia:
+        benchmark_latencia()
+        return
+
+    ventana = pygame.display.set_mode((ANCHO_VENTANA, ALTO_VENTANA))
+    pygame.display.set_caption('Buscaminas')
+    if args.salir_tras_primer_frame:
+        pantalla_inicio()
+        print(f"primer_frame_ms={(time.perf_counter() - INICIO_PROCESO) * 1000:.1f}")
+        return
 
+    medidor = MedidorLatencia(args.traza_latencia)
+    try:
+        jugar(args, rng)
+    finally:
+        medidor.terminar()
+        if args.latencia:
+            imprimir_latencias(medidor)
+    pygame.quit()
+
+def jugar(args, rng):
+    global tablero, FILA, COL, NUM_MINAS, jugando, inicio_tiempo, fin_tiempo, vista, ventana, ANCHO_VENTANA, ALTO_VENTANA
+    # Bucle dirigido por eventos: se bloquea en pygame.event.wait() hasta que
+    # llega una entrada y solo se redibuja lo que ha cambiado
     ejecutando = True
     while ejecutando:
         seleccionando_dificultad = True
+        botones = pantalla_inicio()
         while seleccionando_dificultad:
-            botones = pantalla_inicio()
-            for evento in pygame.event.get():
-                if evento.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-                elif evento.type == pygame.MOUSEBUTTONDOWN:
-                    for rect, dificultad in botones:
-                        if rect.collidepoint(evento.pos):
-                            FILA, COL, NUM_MINAS = DIFICULTADES[dificultad]
-                            ANCHO_VENTANA = COL * ANCHO_CELDA
-                            ALTO_VENTANA = FILA * ALTO_CELDA
-                            ventana = pygame.display.set_mode((ANCHO_VENTANA, ALTO_VENTANA))
-                            pygame.display.set_caption('Buscaminas')
-                            cuadricula = crear_cuadricula(FILA, COL)
-                            colocar_minas(cuadricula, FILA, COL, NUM_MINAS)
-                            celda_descubierta = [[False for _ in range(COL)] for _ in range(FILA)]
-                            celda_marcada = [[False for _ in range(COL)] for _ in range(FILA)]
-                            seleccionando_dificultad = False
-                            jugando = True
-                            inicio_tiempo = time.time()
-                            margen_x = (ventana.get_width() - (COL * ANCHO_CELDA)) // 2
-                            margen_y = (ventana.get_height() - (FILA * ALTO_CELDA)) // 2
+            evento = pygame.event.wait()
+            if evento.type == pygame.QUIT:
+                return
+            elif evento.type == pygame.WINDOWEXPOSED:
+                botones = pantalla_inicio()
+            elif evento.type == pygame.MOUSEBUTTONDOWN:
+                for rect, dificultad in botones:
+                    if rect.collidepoint(evento.pos):
+                        FILA, COL, NUM_MINAS = DIFICULTADES[dificultad]
+                        ANCHO_VENTANA = min(COL * ANCHO_CELDA, ANCHO_MAX_VISTA)
+                        ALTO_VENTANA = min(FILA * ALTO_CELDA, ALTO_MAX_VISTA) + ALTO_BARRA
+                        ventana = pygame.display.set_mode((ANCHO_VENTANA, ALTO_VENTANA))
+                        pygame.display.set_caption('Buscaminas')
+                        pygame.key.set_repeat(200, 30)
+                        tablero = Tablero(FILA, COL, NUM_MINAS)
+                        if not (args.primer_clic_seguro or args.sin_adivinar):
+                            tablero.colocar_minas(rng)
+                        seleccionando_dificultad = False
+                        jugando = True
+                        inicio_tiempo = time.time()
+                        vista = Vista(pygame.Rect(0, ALTO_BARRA, ANCHO_VENTANA, ALTO_VENTANA - ALTO_BARRA))
 
+        dibujar_cuadricula()
         while jugando:
-            for evento in pygame.event.get():
-                if evento.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-                elif evento.type == pygame.MOUSEBUTTONDOWN:
-                    x, y = evento.pos
-                    x = (x - margen_x) // ANCHO_CELDA
-                    y = (y - margen_y) // ALTO_CELDA
-                    if 0 <= x < COL and 0 <= y < FILA:
-                        if evento.button == 1:  # Clic izquierdo
-                            if cuadricula[y][x] == -1:
-                                celda_descubierta[y][x] = True
-                                dibujar_cuadricula(cuadricula, FILA, COL)
-                                pantalla_final("¡Perdiste!")
-                                jugando = False
-                            else:
-                                descubrir_celda(cuadricula, FILA, COL, y, x)
-                        elif evento.button == 3:  # Clic derecho
-                            if not celda_descubierta[y][x]:
-                                celda_marcada[y][x] = not celda_marcada[y][x]
-
-            dibujar_cuadricula(cuadricula, FILA, COL)
-
-            if verificar_victoria(FILA, COL):
+            evento = pygame.event.wait()
+            if evento.type == pygame.QUIT:
+                return
+            elif evento.type == pygame.WINDOWEXPOSED:
+                dibujar_cuadricula()
+            elif evento.type == pygame.KEYDOWN and evento.key == pygame.K_F3:
+                # F3: superposición de latencias
+                medidor.visible = not medidor.visible
+                if not medidor.visible:
+                    pygame.display.update(vista.dibujar())
+            elif evento.type == pygame.KEYDOWN and evento.key == pygame.K_h:
+                mostrar_pista()
+            elif evento.type == pygame.KEYDOWN and evento.key in DIRECCIONES:
+                # Flechas: desplazar la vista
+                dx, dy = DIRECCIONES[evento.key]
+                vista.desplazar(dx * PASO_DESPLAZAMIENTO * vista.lado, dy * PASO_DESPLAZAMIENTO * vista.lado)
+                pygame.display.update(vista.dibujar())
+            elif evento.type == pygame.MOUSEMOTION and evento.buttons[1]:
+                # Arrastrar con el botón central: desplazar la vista
+                vista.desplazar(-evento.rel[0], -evento.rel[1])
+                pygame.display.update(vista.dibujar())
+            elif evento.type == pygame.MOUSEWHEEL:
+                # Rueda: zoom alrededor del ratón
+                if vista.zoom(evento.y, pygame.mouse.get_pos()):
+                    pygame.display.update(vista.dibujar())
+            elif evento.type == pygame.MOUSEBUTTONDOWN and evento.button in (1, 3):
+                medidor.empezar()
+                celda = vista.celda_en(evento.pos)
+                if celda is not None:
+                    x, y = celda
+                    if evento.button == 1:  # Clic izquierdo
+                        if not tablero.minas_colocadas and args.sin_adivinar:
+                            generado, _ = generar_sin_adivinar(FILA, COL, NUM_MINAS, rng, (x, y))
+                            if generado is not None:
+                                # Las banderas puestas antes del primer clic
+                                # pasan al tablero nuevo (la vista ya las muestra)
+                                for i in np.flatnonzero(tablero.estado == MARCADA).tolist():
+                                    generado.alternar_marca(*divmod(i, COL))
+                                tablero = generado
+                        if not tablero.minas_colocadas:
+                            tablero.colocar_minas(rng, seguro=(x, y))
+                            if args.sin_adivinar:
+                                pygame.display.update(dibujar_barra('Sin tablero sin adivinar a tiempo: puede tocar adivinar'))
+                        reveladas = tablero.descubrir(x, y)
+                        medidor.marcar()
+                        actualizar_celdas(reveladas)
+                        medidor.cerrar("descubrir", len(reveladas))
+                        if tablero.explotada:
+                            pantalla_final("¡Perdiste!")
+                            jugando = False
+                    elif evento.button == 3:  # Clic derecho
+                        if tablero.alternar_marca(x, y):
+                            medidor.marcar()
+                            actualizar_celdas([x * COL + y], barra=True)
+                            medidor.cerrar("marcar", 1)
+
+            if jugando and medidor.visible:
+                pygame.display.update(medidor.dibujar())
+
+            if jugando and tablero.victoria():
                 fin_tiempo = time.time()
                 tiempo_total = fin_tiempo - inicio_tiempo
                 pantalla_final(f'¡Has ganado! Tiempo: {tiempo_total:.2f} segundos')
                 jugando = False
 
-    pygame.quit()
-
 if __name__ == "__main__":
     main()
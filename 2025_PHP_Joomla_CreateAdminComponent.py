@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
-import os, re, sys, argparse, datetime, zipfile, pathlib
+import io, os, re, sys, csv, json, time, argparse, datetime, functools, zipfile, pathlib
+from concurrent.futures import ThreadPoolExecutor
 
 def slugify(name: str) -> str:
     s = name.strip()
@@ -17,13 +18,42 @@ def human_title(s: str) -> str:
     s = re.sub(r'\s+', ' ', s)
     return s.title() if s else 'Component'
 
+# __TOKEN__ markers avoid brace conflicts with PHP. PHP's own magic constants
+# (__DIR__, __CLASS__...) use the same shape and are left as they are.
+TOKEN_RE = re.compile(r'__([A-Z][A-Z0-9]*)__')
+PHP_MAGIC = {"LINE", "FILE", "DIR", "FUNCTION", "CLASS", "TRAIT", "METHOD", "NAMESPACE", "COMPILER_HALT_OFFSET"}
+
+@functools.lru_cache(maxsize=None)
+def compile_template(template: str) -> tuple:
+    # Split once into (literal, token, literal, token, ..., literal); odd
+    # positions are token names
+    return tuple(TOKEN_RE.split(template))
+
 def render(template: str, mapping: dict) -> str:
-    # Simple token replacement using __TOKEN__ markers to avoid brace conflicts
+    # One linear pass over the compiled segments; unknown tokens stay as written
+    segments = compile_template(template)
+    out = list(segments)
+    for i in range(1, len(segments), 2):
+        name = segments[i]
+        out[i] = mapping[name] if name in mapping else f"__{name}__"
+    return ''.join(out)
+
+def render_replace(template: str, mapping: dict) -> str:
+    # Previous implementation (one str.replace pass per key), kept for --bench-render
     out = template
     for k, v in mapping.items():
         out = out.replace(f"__{k}__", v)
     return out
 
+def template_tokens(template: str) -> set:
+    return set(compile_template(template)[1::2]) - PHP_MAGIC
+
+def check_tokens(mapping: dict):
+    # Tokens used by TEMPLATE with no value in mapping, and mapping keys that
+    # no template uses
+    used = set().union(*(template_tokens(t) for t in TEMPLATE.values()))
+    return sorted(used - mapping.keys()), sorted(mapping.keys() - used)
+
 TEMPLATE = {
 "manifest": """<?xml version="1.0" encoding="utf-8"?>
 <extension type="component" method="upgrade">
@@ -166,55 +196,203 @@ def write_file(path, content):
     with open(path, "w", encoding="utf-8") as f:
         f.write(content)
 
-def build_scaffold(target_root, slug, vendor, title, menu, author, version, view, do_zip):
-    Pascal = pascal_case(slug)
-    ViewPascal = pascal_case(view)
-    date = datetime.date.today().isoformat()
-    pkg_dir = os.path.join(target_root, f"com_{slug}")
-    manifest_name = f"{slug}.xml"
-
-    m = {
+def source_date():
+    # SOURCE_DATE_EPOCH (reproducible builds) fixes the manifest date and the
+    # ZIP timestamps so identical inputs give byte-identical archives
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    return datetime.datetime.fromtimestamp(int(epoch), datetime.timezone.utc) if epoch else None
+
+def zip_timestamp() -> tuple:
+    # ZIP cannot store dates before 1980
+    date = source_date()
+    if date is None or date.year < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    return date.timetuple()[:6]
+
+def build_mapping(slug, vendor, title, menu, author, version, view):
+    return {
         "SLUG": slug,
-        "DATE": date,
+        "DATE": (source_date() or datetime.datetime.now()).date().isoformat(),
         "AUTHOR": author,
         "VERSION": version,
         "TITLE": title,
         "VENDOR": vendor,
-        "PASCAL": Pascal,
+        "PASCAL": pascal_case(slug),
         "MENU": menu,
         "VIEW": view,
-        "VIEWPASCAL": ViewPascal,
-        "MANIFEST": manifest_name,
+        "VIEWPASCAL": pascal_case(view),
+        "MANIFEST": f"{slug}.xml",
     }
 
-    files = {
-        os.path.join(pkg_dir, manifest_name): render(TEMPLATE["manifest"], m),
-        os.path.join(pkg_dir, "admin", "services", "provider.php"): render(TEMPLATE["provider"], m),
-        os.path.join(pkg_dir, "admin", "src", "Extension", f"{Pascal}Component.php"): render(TEMPLATE["extension_class"], m),
-        os.path.join(pkg_dir, "admin", "src", "Controller", "DisplayController.php"): render(TEMPLATE["display_controller"], m),
-        os.path.join(pkg_dir, "admin", "src", "View", ViewPascal, "HtmlView.php"): render(TEMPLATE["html_view"], m),
-        os.path.join(pkg_dir, "admin", "tmpl", view, "default.php"): render(TEMPLATE["layout_default"], m),
-        os.path.join(pkg_dir, "README.md"): render(TEMPLATE["readme"], m),
+def scaffold_files(m: dict) -> dict:
+    # Archive path (relative to target_root, '/'-separated) -> rendered content
+    pkg = f"com_{m['SLUG']}"
+    return {
+        f"{pkg}/{m['MANIFEST']}": render(TEMPLATE["manifest"], m),
+        f"{pkg}/admin/services/provider.php": render(TEMPLATE["provider"], m),
+        f"{pkg}/admin/src/Extension/{m['PASCAL']}Component.php": render(TEMPLATE["extension_class"], m),
+        f"{pkg}/admin/src/Controller/DisplayController.php": render(TEMPLATE["display_controller"], m),
+        f"{pkg}/admin/src/View/{m['VIEWPASCAL']}/HtmlView.php": render(TEMPLATE["html_view"], m),
+        f"{pkg}/admin/tmpl/{m['VIEW']}/default.php": render(TEMPLATE["layout_default"], m),
+        f"{pkg}/README.md": render(TEMPLATE["readme"], m),
     }
 
-    for path, content in files.items():
-        write_file(path, content)
+def zip_bytes(files: dict, compresslevel=None) -> bytes:
+    # Whole archive built in memory with writestr: entries sorted by name and
+    # fixed timestamps/permissions, so the bytes depend only on the content
+    compression = zipfile.ZIP_STORED if compresslevel == 0 else zipfile.ZIP_DEFLATED
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as z:
+        for name in sorted(files):
+            info = zipfile.ZipInfo(name, date_time=zip_timestamp())
+            info.compress_type = compression
+            info.create_system = 3  # Unix, so external_attr holds the mode
+            info.external_attr = 0o644 << 16
+            z.writestr(info, files[name].encode("utf-8"), compresslevel=compresslevel)
+    return buf.getvalue()
+
+def build_scaffold(target_root, slug, vendor, title, menu, author, version, view, do_zip,
+                   zip_only=False, zip_target=None, compresslevel=None):
+    # zip_only skips the folder and writes just the ZIP, to zip_target if
+    # given ("-" is stdout) or to target_root/com_<slug>.zip
+    m = build_mapping(slug, vendor, title, menu, author, version, view)
+    files = scaffold_files(m)
+
+    pkg_dir = None
+    if not zip_only:
+        pkg_dir = os.path.join(target_root, f"com_{slug}")
+        for name, content in files.items():
+            write_file(os.path.join(target_root, *name.split("/")), content)
 
     zip_path = None
-    if do_zip:
-        zip_path = os.path.join(target_root, f"com_{slug}.zip")
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-            for root, _, filenames in os.walk(pkg_dir):
-                for name in filenames:
-                    full = os.path.join(root, name)
-                    rel = os.path.relpath(full, os.path.dirname(pkg_dir))
-                    z.write(full, rel)
+    if do_zip or zip_only:
+        data = zip_bytes(files, compresslevel)
+        zip_path = zip_target or os.path.join(target_root, f"com_{slug}.zip")
+        if zip_path == "-":
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+            with open(zip_path, "wb") as f:
+                f.write(data)
     return pkg_dir, zip_path
 
+SPEC_FIELDS = ("name", "vendor", "menu", "title", "author", "version", "view")
+
+def component_options(spec: dict, defaults: dict) -> dict:
+    # Row of a batch (or the CLI flags) -> build_scaffold() arguments; empty
+    # fields fall back to defaults
+    unknown = set(spec) - set(SPEC_FIELDS)
+    if unknown:
+        raise ValueError(f"campos desconocidos: {', '.join(sorted(unknown))}")
+    spec = {**defaults, **{k: v for k, v in spec.items() if v not in (None, "")}}
+    if not spec.get("name"):
+        raise ValueError("falta el campo name")
+    slug = slugify(str(spec["name"]))
+    menu = spec.get("menu") or human_title(slug)
+    return {
+        "slug": slug,
+        "vendor": str(spec["vendor"]).strip().replace('/', '\\'),
+        "title": spec.get("title") or menu,
+        "menu": menu,
+        "author": str(spec["author"]),
+        "version": str(spec["version"]),
+        "view": str(spec["view"]),
+    }
+
+def warn_tokens(mapping: dict):
+    unknown, unused = check_tokens(mapping)
+    for name in unknown:
+        print(f"Aviso: token desconocido __{name}__ en las plantillas (se deja tal cual)", file=sys.stderr)
+    for name in unused:
+        print(f"Aviso: la clave {name} no se usa en ninguna plantilla", file=sys.stderr)
+
+def load_batch(path: str) -> list:
+    # CSV with a header row, or JSON: a list of objects or {"components": [...]}
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            return [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("components")
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError(f"{path}: se esperaba una lista de componentes")
+    return data
+
+def build_batch(rows, target_root, defaults, do_zip, jobs, zip_only=False, compresslevel=None):
+    # Builds every row on a thread pool sharing the compiled templates; a
+    # failing row is recorded and does not stop the rest.
+    # Returns [(row number, name, seconds, (pkg_dir, zip_path) or exception)]
+    for template in TEMPLATE.values():
+        compile_template(template)
+
+    def build_one(options):
+        start = time.perf_counter()
+        result = build_scaffold(target_root=target_root, do_zip=do_zip, zip_only=zip_only,
+                                compresslevel=compresslevel, **options)
+        return time.perf_counter() - start, result
+
+    results = []
+    pending = []
+    slugs = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for i, row in enumerate(rows, 1):
+            name = row.get("name") or f"fila {i}"
+            try:
+                options = component_options(row, defaults)
+                if options["slug"] in slugs:
+                    raise ValueError(f"com_{options['slug']} repetido (fila {slugs[options['slug']]})")
+                slugs[options["slug"]] = i
+            except Exception as e:
+                results.append((i, name, 0.0, e))
+                continue
+            pending.append((i, name, pool.submit(build_one, options)))
+        for i, name, future in pending:
+            try:
+                seconds, result = future.result()
+                results.append((i, name, seconds, result))
+            except Exception as e:
+                results.append((i, name, 0.0, e))
+    return sorted(results, key=lambda r: r[0])
+
+def print_batch_summary(results, elapsed, jobs):
+    failures = [r for r in results if isinstance(r[3], Exception)]
+    times = sorted(r[2] for r in results if not isinstance(r[3], Exception))
+    for i, name, _, error in failures:
+        print(f"Error en fila {i} ({name}): {type(error).__name__}: {error}", file=sys.stderr)
+    print(f"Componentes: {len(times)} generados, {len(failures)} con error, {elapsed:.2f} s en total ({jobs} hilos)")
+    if times:
+        print(f"Por componente: mediana {times[len(times) // 2] * 1000:.1f} ms, máximo {times[-1] * 1000:.1f} ms")
+    return not failures
+
+def bench_render(copies=200, repeat=50):
+    # Every template concatenated `copies` times, rendered with both engines
+    mapping = build_mapping("benchcomponent", "Nico", "Bench Component", "Bench Component", "Nico", "1.0.0", "hello")
+    template = "".join(TEMPLATE.values()) * copies
+    tokens = len(TOKEN_RE.findall(template))
+    print(f"Plantilla: {len(template) / 1024:.0f} KiB, {tokens} tokens, {len(mapping)} claves")
+
+    start = time.perf_counter()
+    compile_template(template)
+    print(f"Compilación (una vez): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    results = {}
+    for name, fn in (("str.replace por clave", render_replace), ("compilada, una pasada", render)):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = fn(template, mapping)
+            times.append(time.perf_counter() - start)
+        results[name] = out
+        times.sort()
+        print(f"{name:<24} mediana {times[len(times) // 2] * 1000:8.3f} ms   mínimo {times[0] * 1000:8.3f} ms")
+    print("Salidas idénticas:", len(set(results.values())) == 1)
+
 def main():
     ap = argparse.ArgumentParser(description="Genera un componente básico de administración para Joomla 5 (MVC, PSR-4, provider)")
-    ap.add_argument("--name", required=True, help="Nombre del componente (con o sin 'com_'), ej: helloadminworld")
-    ap.add_argument("--path", required=True, help="Ruta destino donde crear la carpeta com_<name>")
+    ap.add_argument("--bench-render", action="store_true", help="Comparar el render compilado con el de str.replace sobre plantillas grandes")
+    ap.add_argument("--name", help="Nombre del componente (con o sin 'com_'), ej: helloadminworld")
+    ap.add_argument("--path", help="Ruta destino donde crear la carpeta com_<name>")
     ap.add_argument("--vendor", default="Nico", help="Vendor/raíz del namespace PSR-4 (por defecto: Nico)")
     ap.add_argument("--menu", default=None, help="Etiqueta a mostrar en Components (por defecto: Title Case del name)")
     ap.add_argument("--title", default=None, help="Título/Descripción humana (por defecto: menu)")
@@ -222,28 +400,50 @@ def main():
     ap.add_argument("--version", default="1.0.0", help="Versión del componente")
     ap.add_argument("--view", default="hello", help="Nombre de la vista por defecto (y carpeta tmpl)")
     ap.add_argument("--zip", action="store_true", help="Generar también un ZIP instalable")
+    ap.add_argument("--zip-only", nargs="?", const="", metavar="RUTA|-", help="Generar solo el ZIP, en memoria y sin carpeta: en --path, en RUTA o en stdout con '-'")
+    ap.add_argument("--zip-level", type=int, choices=range(10), default=None, metavar="0-9", help="Nivel de compresión del ZIP (0: sin comprimir; por defecto el de zlib)")
+    ap.add_argument("--batch", metavar="SPEC", help="Generar varios componentes desde un JSON o CSV con name/vendor/menu/title/author/version/view; los flags hacen de valores por defecto")
+    ap.add_argument("--jobs", type=int, default=min(32, (os.cpu_count() or 1) + 4), help="Hilos para --batch")
     args = ap.parse_args()
 
-    slug = slugify(args.name)
-    vendor = args.vendor.strip().replace('/', '\\')
-    menu = args.menu if args.menu else human_title(slug)
-    title = args.title if args.title else menu
-    target_root = os.path.abspath(args.path)
-
-    pkg_dir, zip_path = build_scaffold(
-        target_root=target_root,
-        slug=slug,
-        vendor=vendor,
-        title=title,
-        menu=menu,
-        author=args.author,
-        version=args.version,
-        view=args.view,
-        do_zip=args.zip,
-    )
-
-    print("Carpeta generada:", pkg_dir)
-    if zip_path:
+    if args.bench_render:
+        bench_render()
+        return
+    zip_only = args.zip_only is not None
+    zip_target = args.zip_only or None
+    if not (args.name or args.batch):
+        ap.error("--name (o --batch) es obligatorio")
+    if not args.path and not zip_target:
+        ap.error("--path es obligatorio (salvo con --zip-only RUTA|-)")
+    if args.batch and zip_target:
+        ap.error("con --batch, --zip-only escribe cada ZIP en --path y no admite RUTA")
+    if args.jobs < 1:
+        ap.error("--jobs debe ser al menos 1")
+    target_root = os.path.abspath(args.path or ".")
+    defaults = {k: getattr(args, k) for k in SPEC_FIELDS}
+
+    if args.batch:
+        try:
+            rows = load_batch(args.batch)
+        except (OSError, ValueError, csv.Error) as e:
+            ap.error(f"no se pudo leer --batch: {e}")
+        defaults["name"] = None
+        warn_tokens(build_mapping(**component_options({"name": "batch"}, defaults)))
+        start = time.perf_counter()
+        results = build_batch(rows, target_root, defaults, args.zip, args.jobs, zip_only, args.zip_level)
+        if not print_batch_summary(results, time.perf_counter() - start, args.jobs):
+            sys.exit(1)
+        return
+
+    options = component_options({}, defaults)
+    warn_tokens(build_mapping(**options))
+
+    pkg_dir, zip_path = build_scaffold(target_root=target_root, do_zip=args.zip, zip_only=zip_only,
+                                       zip_target=zip_target, compresslevel=args.zip_level, **options)
+
+    if pkg_dir:
+        print("Carpeta generada:", pkg_dir)
+    if zip_path and zip_path != "-":
         print("ZIP instalable:", zip_path)
 
 if __name__ == "__main__":